@@ -1,10 +1,26 @@
 from data_fetcher.middleware import GlobalRequest
 
-from .core import DataFetcher
-from .extras import ValueBoundDataFetcher, cache_within_request
+from .core import (
+    AsyncDataFetcher,
+    DataFetcher,
+    NPlusOneError,
+    NPlusOneWarning,
+    prefetch_all,
+)
+from .extras import (
+    ValueBoundDataFetcher,
+    batch_within_request,
+    cache_within_request,
+)
+from .global_request_context import fetcher_scope
 from .shorthand_fetcher_classes import (
+    AbstractAggregateByAttrFetcher,
     AbstractChildModelByAttrFetcher,
+    AbstractManyToManyFetcher,
+    AbstractModelByCompositeKeyFetcher,
     AbstractModelByIdFetcher,
+    AbstractTopNChildModelByAttrFetcher,
+    ManyToManyFetcherFactory,
     PrimaryKeyFetcherFactory,
 )
 from .util import get_datafetcher_request_cache
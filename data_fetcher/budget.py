@@ -0,0 +1,134 @@
+import sys
+from collections import OrderedDict
+from itertools import chain
+
+from django.conf import settings
+
+from .global_request_context import get_request
+
+_missing = object()
+
+
+class CacheBudget:
+    """
+    Bounds the values cached within a single request, across all fetchers
+    and cached functions, evicting the least recently used values first
+
+    evicted values are simply re-loaded the next time they're requested
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # (id(cache), key) -> (cache, stats, approximate size),
+        # in order of use
+        self._entries = OrderedDict()
+        self.num_bytes = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add_many(self, cache, stats, keys, values):
+        """
+        records values stored in a cache dict,
+        then evicts values until the request is within budget
+        """
+        entries = self._entries
+        cache_id = id(cache)
+        for key, value in zip(keys, values):
+            size = get_approximate_size(value) if self.max_bytes else 0
+            old_entry = entries.pop((cache_id, key), None)
+            if old_entry is not None:
+                self.num_bytes -= old_entry[2]
+            entries[(cache_id, key)] = (cache, stats, size)
+            self.num_bytes += size
+
+        self._evict_over_budget()
+
+    def touch_many(self, cache, keys):
+        """
+        marks cached values as recently used
+        """
+        entries = self._entries
+        cache_id = id(cache)
+        for key in keys:
+            try:
+                entries.move_to_end((cache_id, key))
+            except KeyError:
+                pass
+
+    def discard_many(self, cache, keys):
+        """
+        forgets values that were removed from a cache dict
+        """
+        cache_id = id(cache)
+        for key in keys:
+            entry = self._entries.pop((cache_id, key), None)
+            if entry is not None:
+                self.num_bytes -= entry[2]
+
+    def _is_over_budget(self):
+        if self.max_entries is not None and len(self) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self.num_bytes > self.max_bytes
+
+    def _evict_over_budget(self):
+        while self._entries and self._is_over_budget():
+            (_, key), (cache, stats, size) = self._entries.popitem(last=False)
+            self.num_bytes -= size
+            if cache.pop(key, _missing) is not _missing:
+                stats.evictions += 1
+                self.evictions += 1
+
+
+def _get_object_size(value):
+    size = sys.getsizeof(value)
+    attrs = getattr(value, "__dict__", None)
+    if attrs is not None:
+        # e.g. model instances
+        size += sys.getsizeof(attrs) + sum(map(sys.getsizeof, attrs.values()))
+    return size
+
+
+def get_approximate_size(value):
+    """
+    the size of a value, its attributes and its items, one level deep
+    """
+    if isinstance(value, dict):
+        items = chain(value.keys(), value.values())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        items = value
+    else:
+        return _get_object_size(value)
+
+    return _get_object_size(value) + sum(map(_get_object_size, items))
+
+
+def get_request_budget():
+    """
+    returns the current request's budget,
+    or None when no budget is configured or there is no request
+
+    configure it with DATA_FETCHER_MAX_ENTRIES
+    and/or DATA_FETCHER_MAX_BYTES (approximate)
+    """
+    request = get_request()
+    if request is None:
+        return None
+
+    try:
+        return request.datafetcher_budget
+    except AttributeError:
+        pass
+
+    # settings are only read once per request
+    max_entries = getattr(settings, "DATA_FETCHER_MAX_ENTRIES", None)
+    max_bytes = getattr(settings, "DATA_FETCHER_MAX_BYTES", None)
+    if max_entries is None and max_bytes is None:
+        budget = None
+    else:
+        budget = CacheBudget(max_entries, max_bytes)
+
+    request.datafetcher_budget = budget
+    return budget
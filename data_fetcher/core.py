@@ -1,28 +1,125 @@
+import asyncio
+import inspect
+import os
+import threading
+import time
+import traceback
+import warnings
 from collections import defaultdict
+from functools import partial
+from itertools import chain
 
-from .util import MissingRequestContextException, get_datafetcher_request_cache
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.functional import SimpleLazyObject, empty
+
+from asgiref.sync import sync_to_async
+
+from .budget import get_request_budget
+from .stats import get_stats_for
+from .util import (
+    MissingRequestContextException,
+    get_datafetcher_request_cache,
+    run_concurrently,
+)
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# guards creating instances in the request cache, which worker threads share
+_instance_lock = threading.RLock()
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+class NPlusOneWarning(UserWarning):
+    pass
+
+
+def _get_caller_stack():
+    frames = [
+        frame
+        for frame in traceback.extract_stack()
+        if not frame.filename.startswith(_PACKAGE_DIR)
+    ]
+    return "".join(traceback.format_list(frames))
 
 
 class BaseDataFetcher:
+    # batches larger than this are split into several batch_load calls
+    max_batch_size = None
+    # when set, split batches are loaded concurrently in this many threads
+    max_batch_workers = None
+    # overrides settings.DATA_FETCHER_N_PLUS_ONE_THRESHOLD for this class
+    n_plus_one_threshold = None
+
     def __init__(self):
         self._cache = {}
         self._queue = set()
+        self._stats = get_stats_for(type(self))
+        # set when the request's cached values are bounded
+        self._budget = get_request_budget()
 
     def get(self, key):
-        all_keys = {key, *self._queue}
-
-        self.prefetch_keys(all_keys)
+        # fast path: cache hits are a single dict lookup
+        try:
+            value = self._cache[key]
+        except KeyError:
+            pass
+        else:
+            self._stats.hits += 1
+            if self._budget is not None:
+                self._budget.touch_many(self._cache, [key])
+            return value
 
-        return self._cache[key]
+        return self.get_many([key])[0]
 
     def get_many(self, keys):
-        all_keys = {*keys, *self._queue}
+        cache = self._cache
+        if not isinstance(keys, (list, tuple)):
+            keys = list(keys)
+
+        uncached_keys = [key for key in keys if key not in cache]
+        self._stats.hits += len(keys) - len(uncached_keys)
+
+        if self._queue:
+            # queued keys are loaded along with the requested keys,
+            # after which the queue is drained
+            uncached_keys = list(
+                {
+                    *uncached_keys,
+                    *(key for key in self._queue if key not in cache),
+                }
+            )
+            self._queue.clear()
+        elif len(uncached_keys) > 1:
+            uncached_keys = list(dict.fromkeys(uncached_keys))
+
+        if self._budget is not None:
+            return self._get_many_within_budget(keys, uncached_keys)
 
-        uncached_keys = [key for key in all_keys if key not in self._cache]
         if uncached_keys:
+            self._stats.misses += len(uncached_keys)
             self._get_many_uncached_values(uncached_keys)
 
-        return [self._cache.get(key) for key in keys]
+        return [cache.get(key) for key in keys]
+
+    def _get_many_within_budget(self, keys, uncached_keys):
+        # loading values can evict other requested values from the cache,
+        # so they're collected before and during the load
+        cache = self._cache
+        values = {key: cache[key] for key in keys if key in cache}
+        self._budget.touch_many(cache, values)
+        if uncached_keys:
+            self._stats.misses += len(uncached_keys)
+            values.update(
+                zip(
+                    uncached_keys,
+                    self._get_many_uncached_values(uncached_keys),
+                )
+            )
+        return [values.get(key) for key in keys]
 
     def prefetch_keys(self, keys):
         self.get_many(keys)
@@ -47,37 +144,134 @@ class BaseDataFetcher:
                 "must implement batch_load or batch_load_dict"
             )
 
+    def _timed_batch_load_fn(self, keys):
+        start = time.perf_counter()
+        try:
+            return self._batch_load_fn(keys)
+        finally:
+            self._stats.record_batch(len(keys), time.perf_counter() - start)
+
+    def _split_batch(self, keys):
+        size = self.max_batch_size
+        keys = list(keys)
+        if not size or len(keys) <= size:
+            return [keys]
+        return [keys[i : i + size] for i in range(0, len(keys), size)]
+
+    def _batch_load_chunks(self, keys):
+        chunks = self._split_batch(keys)
+        if len(chunks) == 1:
+            return self._timed_batch_load_fn(chunks[0])
+
+        if self.max_batch_workers and self.max_batch_workers > 1:
+            chunk_values = run_concurrently(
+                [partial(self._timed_batch_load_fn, c) for c in chunks],
+                max_workers=self.max_batch_workers,
+            )
+        else:
+            chunk_values = [self._timed_batch_load_fn(c) for c in chunks]
+
+        return list(chain.from_iterable(chunk_values))
+
+    def _check_for_n_plus_one(self, num_keys):
+        """
+        with settings.DATA_FETCHER_N_PLUS_ONE set to "warn" or "raise",
+        reports fetchers that keep loading tiny batches within a request
+        """
+        mode = getattr(settings, "DATA_FETCHER_N_PLUS_ONE", None)
+        if not mode:
+            return
+
+        max_keys = getattr(settings, "DATA_FETCHER_N_PLUS_ONE_BATCH_SIZE", 1)
+        if num_keys > max_keys:
+            return
+
+        stats = self._stats
+        stats.small_batches += 1
+        threshold = self.n_plus_one_threshold or getattr(
+            settings, "DATA_FETCHER_N_PLUS_ONE_THRESHOLD", 10
+        )
+        if stats.small_batches < threshold:
+            return
+
+        message = (
+            f"{type(self).__name__} loaded {stats.small_batches} batches of "
+            f"{max_keys} key(s) or less in this request, "
+            "consider prefetching its keys. Called from:\n"
+            f"{_get_caller_stack()}"
+        )
+        if mode == "raise":
+            raise NPlusOneError(message)
+        elif stats.small_batches == threshold:
+            # only warn once per fetcher and request
+            warnings.warn(message, NPlusOneWarning)
+
     def batch_load_and_cache(self, keys):
-        values = self._batch_load_fn(keys)
+        if not isinstance(keys, (list, tuple)):
+            keys = list(keys)
+        self._check_for_n_plus_one(len(keys))
+        values = self._batch_load_chunks(keys)
         for key, value in zip(keys, values):
             self._cache[key] = value
+        if self._budget is not None:
+            self._budget.add_many(self._cache, self._stats, keys, values)
         return values
 
-    def prime(self, key, value):
-        self._cache[key] = value
+    def prime(self, key, value, overwrite=True):
+        if overwrite or key not in self._cache:
+            self._cache[key] = value
+            if self._budget is not None:
+                self._budget.add_many(self._cache, self._stats, [key], [value])
+
+    def evict(self, keys):
+        """
+        drops cached values, they will be re-loaded on the next get
+        """
+        if self._budget is not None:
+            keys = list(keys)
+            self._budget.discard_many(self._cache, keys)
+        for key in keys:
+            self._cache.pop(key, None)
 
     def enqueue_keys(self, keys):
-        self._queue.update(set(keys))
+        self._queue.update(key for key in keys if key not in self._cache)
 
     def fetch_queued(self):
-        queued_keys = set(self._queue)
-        self.get_many(queued_keys)
+        if self._queue:
+            self.get_many(list(self._queue))
 
     def get_lazy(self, key):
         self.enqueue_keys([key])
-        return LazyFetchedValue(lambda: self.get(key))
+        # get_many also flushes the rest of the queue, even on cache hits
+        return LazyFetchedValue(lambda: self.get_many([key])[0])
 
     def get_many_lazy(self, keys):
+        keys = list(keys)
         self.enqueue_keys(keys)
         return LazyFetchedValue(lambda: self.get_many(keys))
 
 
-class LazyFetchedValue:
-    def __init__(self, get_val):
-        self.get_val = get_val
+class LazyFetchedValue(SimpleLazyObject):
+    """
+    Transparent proxy to a fetched value
+
+    Attribute access, iteration, truthiness, etc. are forwarded to the value,
+    so it can be used directly in templates. The first access loads every key
+    queued on the fetcher in a single batch.
+    """
+
+    def get(self, *args, **kwargs):
+        """
+        explicitly resolve the value
 
-    def get(self):
-        return self.get_val()
+        with arguments, this is forwarded to the value's own get method,
+        e.g. lazy_dict.get("key", default)
+        """
+        if self._wrapped is empty:
+            self._setup()
+        if args or kwargs:
+            return self._wrapped.get(*args, **kwargs)
+        return self._wrapped
 
 
 class DataFetcher(BaseDataFetcher):
@@ -88,18 +282,52 @@ class DataFetcher(BaseDataFetcher):
     # this variable can be used for composition
     datafetcher_instance_cache = None
 
+    # opt-in cross-request cache tier, backed by django's cache framework
+    # set this to a CACHES alias, e.g. "default"
+    shared_cache_alias = None
+    shared_cache_timeout = 300
+    # defaults to the fetcher's module and class name
+    shared_cache_prefix = None
+
+    # database alias for the fetcher's queries,
+    # None lets django's database routers pick one
+    using = None
+
     __create_key = object()
 
-    def __init__(self, create_key):
+    def __init__(self, create_key, using=None):
         # Hacky way to make constructor "private"
         assert (
             create_key == DataFetcher.__create_key
         ), "Never create data-fetcher instances directly, use get_instance"
 
         super().__init__()
+        if using is not None:
+            self.using = using
+
+    @classmethod
+    def get_instance(cls, raise_on_no_context=False, using=None):
+        """
+        pass using to get a separate instance (and request cache)
+        for a database alias, e.g. to read from the primary after a write
+        """
+        if using is None or using == cls.using:
+            instance_key = cls
+        else:
+            instance_key = (cls, using)
+
+        return cls._get_or_create_instance(
+            instance_key, raise_on_no_context, using=using
+        )
 
     @classmethod
-    def get_instance(cls, raise_on_no_context=False):
+    def _get_or_create_instance(
+        cls, instance_key, raise_on_no_context=False, **init_kwargs
+    ):
+        """
+        returns the request's instance stored under instance_key,
+        which must be cls or a tuple starting with cls
+        """
         try:
             fetcher_instance_cache = get_datafetcher_request_cache()
         except MissingRequestContextException as e:
@@ -108,7 +336,378 @@ class DataFetcher(BaseDataFetcher):
             else:
                 fetcher_instance_cache = {}
 
-        if cls not in fetcher_instance_cache:
-            fetcher_instance_cache[cls] = cls(DataFetcher.__create_key)
+        try:
+            return fetcher_instance_cache[instance_key]
+        except KeyError:
+            pass
+
+        # model fetchers prime other fetchers from worker threads,
+        # e.g. within prefetch_all, so instances must only be created once
+        with _instance_lock:
+            if instance_key not in fetcher_instance_cache:
+                fetcher_instance_cache[instance_key] = cls(
+                    DataFetcher.__create_key, **init_kwargs
+                )
+
+        return fetcher_instance_cache[instance_key]
+
+    @classmethod
+    def get_request_instances(cls):
+        """
+        returns this fetcher's instances on the current request,
+        one per database alias it was used with
+        """
+        try:
+            fetcher_instance_cache = get_datafetcher_request_cache()
+        except MissingRequestContextException:
+            return []
+
+        return [
+            fetcher
+            for instance_key, fetcher in fetcher_instance_cache.items()
+            if instance_key is cls
+            or (type(instance_key) is tuple and instance_key[0] is cls)
+        ]
+
+    @classmethod
+    def clear(cls):
+        """
+        drops all of this fetcher's values cached on the current request
+
+        the shared tier can't be cleared by prefix, use evict(keys) for that
+        """
+        for fetcher in cls.get_request_instances():
+            if fetcher._budget is not None:
+                fetcher._budget.discard_many(fetcher._cache, fetcher._cache)
+            fetcher._cache.clear()
+            fetcher._queue.clear()
+
+    def get_shared_cache_key(self, key):
+        return self.make_shared_cache_key(key, self.using)
+
+    def dump_shared_values(self, values):
+        """
+        converts loaded values to what's stored in the shared tier,
+        e.g. the ids of records that are invalidated separately
+        """
+        return values
+
+    def load_shared_values(self, values):
+        """
+        converts values read from the shared tier back, in a single batch,
+        the reverse of dump_shared_values
+        """
+        return values
+
+    @classmethod
+    def make_shared_cache_key(cls, key, using=None):
+        """
+        override this if str(key) isn't unique for your keys
+        """
+        prefix = cls.shared_cache_prefix
+        if prefix is None:
+            prefix = f"datafetcher:{cls.__module__}.{cls.__qualname__}"
+        if using is not None:
+            # values read from different databases may differ, e.g. replicas
+            prefix = f"{prefix}@{using}"
+        return f"{prefix}:{key}"
+
+    @classmethod
+    def evict_from_shared_cache(cls, keys):
+        """
+        drops values from the shared tier, for every database alias,
+        without needing an instance on the current request
+        """
+        if cls.shared_cache_alias is None:
+            return
+        keys = list(keys)
+        caches[cls.shared_cache_alias].delete_many(
+            [
+                cls.make_shared_cache_key(key, using)
+                for using in (None, *settings.DATABASES)
+                for key in keys
+            ]
+        )
+
+    def evict(self, keys):
+        keys = list(keys)
+        super().evict(keys)
+        if self.shared_cache_alias is not None:
+            caches[self.shared_cache_alias].delete_many(
+                [self.get_shared_cache_key(key) for key in keys]
+            )
+
+    def _get_many_uncached_values(self, keys):
+        if self.shared_cache_alias is None:
+            return super()._get_many_uncached_values(keys)
+
+        shared_cache = caches[self.shared_cache_alias]
+        cache_keys = [self.get_shared_cache_key(key) for key in keys]
+        shared_values = shared_cache.get_many(cache_keys)
+
+        values = {}
+        missing_keys = []
+        for key, cache_key in zip(keys, cache_keys):
+            if cache_key in shared_values:
+                values[key] = shared_values[cache_key]
+            else:
+                missing_keys.append(key)
+        if values:
+            values = dict(
+                zip(values, self.load_shared_values(list(values.values())))
+            )
+            self._cache.update(values)
+            if self._budget is not None:
+                self._budget.add_many(
+                    self._cache,
+                    self._stats,
+                    list(values),
+                    list(values.values()),
+                )
+
+        if missing_keys:
+            missing_values = self.batch_load_and_cache(missing_keys)
+            values.update(zip(missing_keys, missing_values))
+            shared_cache.set_many(
+                {
+                    self.get_shared_cache_key(key): value
+                    for key, value in zip(
+                        missing_keys,
+                        self.dump_shared_values(missing_values),
+                    )
+                },
+                timeout=self.shared_cache_timeout,
+            )
+
+        return [values[key] for key in keys]
+
+
+def prefetch_all(keys_by_fetcher, max_workers=4):
+    """
+    Prefetches keys for several unrelated fetchers at once,
+    e.g. {AuthorByIdFetcher: author_ids, TagsByBookIdFetcher: book_ids}
+
+    Their batch loads run concurrently in a thread pool of up to max_workers
+    threads, each with its own DB connections. Within a transaction, they
+    run in the calling thread instead, so they can see its uncommitted rows.
+
+    Fetcher classes are resolved with get_instance, pass instances to target
+    a specific database alias. Values are primed into the request's
+    instances, as with prefetch_keys.
+    """
+    keys_by_instance = {}
+    for fetcher, keys in keys_by_fetcher.items():
+        if isinstance(fetcher, type):
+            fetcher = fetcher.get_instance()
+        keys_by_instance.setdefault(fetcher, []).extend(keys)
+
+    loads = [
+        partial(fetcher.prefetch_keys, keys)
+        for fetcher, keys in keys_by_instance.items()
+        if any(key not in fetcher._cache for key in keys)
+    ]
+    if len(loads) > 1 and max_workers > 1:
+        run_concurrently(loads, max_workers=max_workers)
+    else:
+        for load in loads:
+            load()
+
+
+class AsyncDataFetcher(DataFetcher):
+    """
+    DataFetcher with awaitable aget/aget_many/aprefetch_keys methods
+
+    Like JS's DataLoader, keys requested by coroutines during the same
+    event-loop tick are loaded together in a single batch. batch_load and
+    batch_load_dict may be coroutine functions; synchronous ones (e.g. ORM
+    queries) are run through sync_to_async, once per batch.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # futures for keys that are pending or currently being loaded
+        self._futures = {}
+        self._pending_keys = []
+        self._dispatch_scheduled = False
+        # the event loop only keeps weak references to tasks,
+        # in-flight batches must not be garbage-collected under their waiters
+        self._tasks = set()
+
+    async def aget(self, key):
+        if key in self._cache:
+            self._stats.hits += 1
+            if self._budget is not None:
+                self._budget.touch_many(self._cache, [key])
+            return self._cache[key]
+
+        # other coroutines may await the same future,
+        # cancelling this one mustn't cancel theirs
+        return await asyncio.shield(self._get_future(key))
+
+    async def aget_many(self, keys):
+        if not isinstance(keys, (list, tuple)):
+            keys = list(keys)
+
+        # collected as they're found and loaded,
+        # a request's budget can evict them from the cache in the meantime
+        values = {}
+        futures = {}
+        for key in keys:
+            if key in self._cache:
+                values[key] = self._cache[key]
+                self._stats.hits += 1
+            else:
+                futures[key] = self._get_future(key)
+
+        if self._budget is not None:
+            self._budget.touch_many(self._cache, values)
+        if futures:
+            values.update(
+                zip(
+                    futures,
+                    await asyncio.gather(
+                        *[asyncio.shield(f) for f in futures.values()]
+                    ),
+                )
+            )
+
+        return [values[key] for key in keys]
+
+    async def aprefetch_keys(self, keys):
+        await self.aget_many(keys)
+
+    async def aget_many_as_dict(self, keys):
+        return dict(zip(keys, await self.aget_many(keys)))
+
+    def _get_future(self, key):
+        """
+        returns the future for a key,
+        scheduling a batch at the end of the current tick if necessary
+        """
+        future = self._futures.get(key)
+        if future is not None and not future.cancelled():
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._futures[key] = future
+        self._stats.misses += 1
+        self._pending_keys.append(key)
+
+        if not self._dispatch_scheduled:
+            self._dispatch_scheduled = True
+            loop.call_soon(self._dispatch_pending)
+
+        return future
+
+    def _dispatch_pending(self):
+        keys = self._pending_keys
+        self._pending_keys = []
+        self._dispatch_scheduled = False
+
+        # queued keys ride along with the batch, but nobody awaits them
+        queued_keys = [
+            key
+            for key in self._queue
+            if key not in self._cache and key not in self._futures
+        ]
+        self._queue.clear()
+
+        task = asyncio.ensure_future(self._load_keys(keys, queued_keys))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _load_keys(self, keys, queued_keys):
+        all_keys = [*keys, *queued_keys]
+        try:
+            self._check_for_n_plus_one(len(all_keys))
+            values = await self._aload_values(all_keys)
+        except Exception as e:
+            for key in keys:
+                future = self._futures.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, value in zip(all_keys, values):
+            self._cache[key] = value
+            future = self._futures.pop(key, None)
+            if future is not None and not future.done():
+                future.set_result(value)
+        if self._budget is not None:
+            self._budget.add_many(self._cache, self._stats, all_keys, values)
+
+    async def _aload_values(self, keys):
+        if self.shared_cache_alias is None:
+            return await self._abatch_load_chunks(keys)
+
+        shared_cache = caches[self.shared_cache_alias]
+        cache_keys = [self.get_shared_cache_key(key) for key in keys]
+        shared_values = await shared_cache.aget_many(cache_keys)
+        if shared_values:
+            shared_values = dict(
+                zip(
+                    shared_values,
+                    await _call_maybe_async(
+                        self.load_shared_values, list(shared_values.values())
+                    ),
+                )
+            )
+
+        missing_keys = [
+            key
+            for key, cache_key in zip(keys, cache_keys)
+            if cache_key not in shared_values
+        ]
+        loaded_values = {}
+        if missing_keys:
+            values = await self._abatch_load_chunks(missing_keys)
+            loaded_values = dict(zip(missing_keys, values))
+            await shared_cache.aset_many(
+                {
+                    self.get_shared_cache_key(key): value
+                    for key, value in zip(
+                        missing_keys, self.dump_shared_values(values)
+                    )
+                },
+                timeout=self.shared_cache_timeout,
+            )
+
+        return [
+            (
+                shared_values[cache_key]
+                if cache_key in shared_values
+                else loaded_values[key]
+            )
+            for key, cache_key in zip(keys, cache_keys)
+        ]
+
+    async def _abatch_load_chunks(self, keys):
+        chunk_values = await asyncio.gather(
+            *[self._abatch_load_fn(chunk) for chunk in self._split_batch(keys)]
+        )
+        return list(chain.from_iterable(chunk_values))
+
+    async def _abatch_load_fn(self, keys):
+        start = time.perf_counter()
+        try:
+            return await self._acall_batch_load(keys)
+        finally:
+            self._stats.record_batch(len(keys), time.perf_counter() - start)
+
+    async def _acall_batch_load(self, keys):
+        if getattr(self, "batch_load", None):
+            return await _call_maybe_async(self.batch_load, keys)
+        elif getattr(self, "batch_load_dict", None):
+            value_dict = await _call_maybe_async(self.batch_load_dict, keys)
+            return [value_dict.get(key) for key in keys]
+        else:
+            raise NotImplementedError(
+                "must implement batch_load or batch_load_dict"
+            )
+
 
-        return fetcher_instance_cache[cls]
+async def _call_maybe_async(fn, keys):
+    if inspect.iscoroutinefunction(fn):
+        return await fn(keys)
+    return await sync_to_async(fn)(keys)
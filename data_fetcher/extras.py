@@ -1,6 +1,15 @@
-from functools import cache, wraps
+import inspect
+import time
+import warnings
+from collections import OrderedDict, namedtuple
+from functools import partial, wraps
 
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Model, QuerySet
+
+from .budget import get_request_budget
 from .core import DataFetcher
+from .stats import get_stats_for
 from .util import MissingRequestContextException, get_datafetcher_request_cache
 
 
@@ -8,39 +17,340 @@ class CacheDecoratorException(Exception):
     pass
 
 
-def cache_within_request(fn):
+class CacheDecoratorWarning(UserWarning):
+    pass
+
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+_KWARGS_MARK = object()
+
+_POSITIONAL_KINDS = (
+    inspect.Parameter.POSITIONAL_ONLY,
+    inspect.Parameter.POSITIONAL_OR_KEYWORD,
+)
+
+
+def _make_cache_key(args, kwargs):
+    if kwargs:
+        return (*args, _KWARGS_MARK, *sorted(kwargs.items()))
+    return args
+
+
+# argument types that are hashable and can be cached as they are
+_HASHABLE_TYPES = frozenset([int, str, float, bool, bytes, type(None)])
+
+
+class _IdentityKey:
+    """
+    keys a value by identity, holding on to it so its id isn't reused
+    while the key is cached
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, _IdentityKey) and other.value is self.value
+
+    def __hash__(self):
+        return id(self.value)
+
+
+def make_hashable(value):
+    """
+    the default key function of cache_within_request, applied to each argument
+
+    keys model instances by (model, pk), so different instances of a row
+    share a value, and unsaved instances by identity. Querysets are keyed by
+    their SQL, and lists, tuples, sets and dicts by frozen copies of their
+    (recursively converted) items
+    """
+    if type(value) in _HASHABLE_TYPES:
+        return value
+    if isinstance(value, Model):
+        label = value._meta.concrete_model._meta.label
+        if value.pk is None:
+            return (label, _IdentityKey(value))
+        return (label, value.pk)
+    if isinstance(value, QuerySet):
+        try:
+            sql, params = value.query.get_compiler(using=value.db).as_sql()
+        except EmptyResultSet:
+            sql, params = None, ()
+        return (value.model._meta.label, value.db, sql, make_hashable(params))
+    if isinstance(value, (list, tuple)):
+        return tuple(make_hashable(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(make_hashable(item) for item in value)
+    if isinstance(value, dict):
+        return frozenset(
+            (make_hashable(k), make_hashable(v)) for k, v in value.items()
+        )
+    return value
+
+
+def _get_key_function(fn, typed=False, key=make_hashable):
+    """
+    returns a function making cache keys from a call's args and kwargs
+
+    calls are normalized against fn's signature, so that f(1, b=2), f(1, 2)
+    and (if b defaults to 2) f(1) share a key. Calls passing every
+    positional parameter positionally skip the normalization, unless fn has
+    keyword-only parameters with defaults.
+    Then key is applied to each argument, unless it's None.
+    """
+    try:
+        signature = inspect.signature(fn)
+    except (TypeError, ValueError):
+        # e.g. some builtins
+        signature = None
+    else:
+        parameters = signature.parameters.values()
+        num_positional = sum(p.kind in _POSITIONAL_KINDS for p in parameters)
+        has_var_positional = any(
+            p.kind is inspect.Parameter.VAR_POSITIONAL for p in parameters
+        )
+        # f(1) and f(1, b=2) must share a key for def f(a, *, b=2)
+        has_keyword_only_defaults = any(
+            p.kind is inspect.Parameter.KEYWORD_ONLY
+            and p.default is not inspect.Parameter.empty
+            for p in parameters
+        )
+
+    def make_key(args, kwargs):
+        if signature is not None and (
+            kwargs
+            or has_keyword_only_defaults
+            or len(args) < num_positional
+            or (len(args) > num_positional and not has_var_positional)
+        ):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            args, kwargs = bound.args, bound.kwargs
+
+        if key is None:
+            cache_key = _make_cache_key(args, kwargs)
+        else:
+            cache_key = _make_cache_key(
+                tuple(map(key, args)),
+                {name: key(value) for name, value in kwargs.items()},
+            )
+        if typed:
+            cache_key += tuple(type(value) for value in args)
+            cache_key += tuple(type(value) for value in kwargs.values())
+        return cache_key
+
+    return make_key
+
+
+class _FunctionCache:
+    """
+    a cached function's values and stats, for a single request
+    """
+
+    def __init__(self, fn, maxsize=None):
+        self.maxsize = maxsize
+        # ordered by recency of use when bounded
+        self.values = {} if maxsize is None else OrderedDict()
+        self.stats = get_stats_for(fn)
+        # set when the request's cached values are bounded
+        self.budget = get_request_budget()
+
+    def set(self, key, value):
+        if self.maxsize == 0:
+            return
+
+        self.values[key] = value
+        if self.maxsize is not None and len(self.values) > self.maxsize:
+            # evict the least recently used value
+            evicted_key, _ = self.values.popitem(last=False)
+            if self.budget is not None:
+                self.budget.discard_many(self.values, [evicted_key])
+        if self.budget is not None:
+            self.budget.add_many(self.values, self.stats, [key], [value])
+
+    def pop(self, key):
+        self.values.pop(key, None)
+        if self.budget is not None:
+            self.budget.discard_many(self.values, [key])
+
+    def clear(self):
+        if self.budget is not None:
+            self.budget.discard_many(self.values, self.values)
+        self.values.clear()
+
+
+def _get_function_cache(fn, maxsize=None):
+    datafetcher_cache = get_datafetcher_request_cache()
+    # use function itself as key
+    if fn not in datafetcher_cache:
+        datafetcher_cache[fn] = _FunctionCache(fn, maxsize)
+    return datafetcher_cache[fn]
+
+
+def cache_within_request(
+    fn=None, *, maxsize=None, typed=False, key=make_hashable
+):
     """
     ensure a function's values are cached for the duration of a request
 
+    use it bare, or with options, like functools.lru_cache:
+    maxsize bounds the values cached per request (least recently used
+    ones are evicted first), typed caches e.g. f(1) and f(1.0) separately
+
+    key is called with each argument and returns a hashable stand-in for it,
+    see make_hashable. Pass key=None to use the arguments as they are.
     """
+    if fn is None:
+        return partial(
+            cache_within_request, maxsize=maxsize, typed=typed, key=key
+        )
 
     if isinstance(fn, classmethod):
         raise CacheDecoratorException(
             "apply the classmethod decorator after (above) the cache_within_request decorator"
         )
 
+    make_key = _get_key_function(fn, typed, key)
+
     @wraps(fn)
     def wrapper(*args, **kwargs):
         try:
-            datafetcher_cache = get_datafetcher_request_cache()
+            function_cache = _get_function_cache(fn, maxsize)
         except MissingRequestContextException:
-            print(
-                f"WARNING: calling {fn.__name__} outside of a request context,"
-                " caching is disabled"
+            warnings.warn(
+                f"calling {fn.__name__} outside of a request context, "
+                "caching is disabled. Use fetcher_scope() to cache values "
+                "in tasks, commands and scripts",
+                CacheDecoratorWarning,
+                stacklevel=2,
             )
             return fn(*args, **kwargs)
 
-        # use function itself as key
-        if fn not in datafetcher_cache:
-            datafetcher_cache[fn] = cache(fn)
+        key = make_key(args, kwargs)
+        try:
+            value = function_cache.values[key]
+        except KeyError:
+            pass
+        else:
+            function_cache.stats.hits += 1
+            if maxsize is not None:
+                function_cache.values.move_to_end(key)
+            if function_cache.budget is not None:
+                function_cache.budget.touch_many(function_cache.values, [key])
+            return value
+
+        function_cache.stats.misses += 1
+        start = time.perf_counter()
+        value = fn(*args, **kwargs)
+        function_cache.stats.record_batch(1, time.perf_counter() - start)
 
-        return datafetcher_cache[fn](*args, **kwargs)
+        function_cache.set(key, value)
+        return value
+
+    def cache_clear_for_request(*args, **kwargs):
+        """
+        evicts the value cached for these arguments in the current request
+        """
+        try:
+            function_cache = _get_function_cache(fn, maxsize)
+        except MissingRequestContextException:
+            return
+        function_cache.pop(make_key(args, kwargs))
+
+    def cache_clear():
+        """
+        evicts all of this function's values cached in the current request
+        """
+        try:
+            _get_function_cache(fn, maxsize).clear()
+        except MissingRequestContextException:
+            pass
+
+    def cache_info():
+        """
+        returns the current request's hits, misses and cache size
+        """
+        try:
+            function_cache = _get_function_cache(fn, maxsize)
+        except MissingRequestContextException:
+            return CacheInfo(0, 0, maxsize, 0)
+        return CacheInfo(
+            function_cache.stats.hits,
+            function_cache.stats.misses,
+            maxsize,
+            len(function_cache.values),
+        )
+
+    wrapper.cache_clear_for_request = cache_clear_for_request
+    wrapper.cache_clear = cache_clear
+    wrapper.cache_info = cache_info
+
+    return wrapper
+
+
+def batch_within_request(batch_fn=None, **fetcher_attrs):
+    """
+    turns a batch function (keys -> dict of values) into a single-key helper,
+    backed by a DataFetcher class generated for it
+
+    calling the helper with one key loads it through the request's fetcher
+    instance, so queued and prefetched keys are loaded in a single batch.
+    The helper also has prefetch, get_many, get_lazy, get_many_lazy and
+    cache_clear methods, and fetcher_class.
+
+    keyword options are set as attributes on the fetcher class,
+    e.g. max_batch_size or shared_cache_alias
+    """
+    if batch_fn is None:
+        return partial(batch_within_request, **fetcher_attrs)
+
+    fetcher_class = type(
+        f"{batch_fn.__name__}__Fetcher",
+        (DataFetcher,),
+        dict(
+            fetcher_attrs,
+            batch_load_dict=staticmethod(batch_fn),
+            __module__=batch_fn.__module__,
+            __qualname__=f"{batch_fn.__qualname__}__Fetcher",
+        ),
+    )
+
+    @wraps(batch_fn)
+    def wrapper(key):
+        return fetcher_class.get_instance().get(key)
+
+    def get_many(keys):
+        return fetcher_class.get_instance().get_many(keys)
+
+    def prefetch(keys):
+        fetcher_class.get_instance().prefetch_keys(keys)
+
+    def get_lazy(key):
+        return fetcher_class.get_instance().get_lazy(key)
+
+    def get_many_lazy(keys):
+        return fetcher_class.get_instance().get_many_lazy(keys)
+
+    wrapper.fetcher_class = fetcher_class
+    wrapper.get_many = get_many
+    wrapper.prefetch = prefetch
+    wrapper.get_lazy = get_lazy
+    wrapper.get_many_lazy = get_many_lazy
+    wrapper.cache_clear = fetcher_class.clear
 
     return wrapper
 
 
 class ValueBoundFetcherFactory:
-    datafetcher_classes_by_key = {}
+    # classes are recycled least-recently-used first beyond this many,
+    # so long-lived processes binding many values don't grow without limit
+    max_classes = 1000
+
+    datafetcher_classes_by_key = OrderedDict()
 
     @staticmethod
     def _create_datafetcher_cls_for_keyval(
@@ -56,6 +366,7 @@ class ValueBoundFetcherFactory:
             (parent_cls,),
             dict(
                 bound_value=value,
+                bound_key=key,
             ),
         )
 
@@ -73,12 +384,15 @@ class ValueBoundFetcherFactory:
         dict_key = (parent_cls, key)
 
         if dict_key in cls.datafetcher_classes_by_key:
+            cls.datafetcher_classes_by_key.move_to_end(dict_key)
             return cls.datafetcher_classes_by_key[dict_key]
         else:
             fetcher = cls._create_datafetcher_cls_for_keyval(
                 parent_cls, key, value
             )
             cls.datafetcher_classes_by_key[dict_key] = fetcher
+            if len(cls.datafetcher_classes_by_key) > cls.max_classes:
+                cls.datafetcher_classes_by_key.popitem(last=False)
             return fetcher
 
 
@@ -91,14 +405,38 @@ class ValueBoundDataFetcher(DataFetcher):
 
     """
 
-    def __init__(self, *args, **kwargs):
-        if not getattr(self, "bound_value", None):
+    bound_value = None
+    bound_key = None
+
+    def __init__(self, *args, bound_key=None, bound_value=None, **kwargs):
+        if bound_value is not None:
+            self.bound_key = bound_key
+            self.bound_value = bound_value
+        if self.bound_value is None:
             raise MissingRequestContextException(
-                "AbstractThreatLocationAsOfTimeByThreatIdFetcher "
-                "must be instantiated  KeyedDataFetcherFactory"
+                f"{type(self).__name__} must be bound to a value, "
+                "use get_bound_instance or get_value_bound_class"
             )
         super().__init__(*args, **kwargs)
 
+    @classmethod
+    def get_bound_instance(cls, key, value=None, raise_on_no_context=False):
+        """
+        returns the request's instance bound to value (or to key,
+        if value isn't provided)
+
+        unlike get_value_bound_class, this doesn't create a class per value,
+        so nothing outlives the request
+        """
+        if value is None:
+            value = key
+        return cls._get_or_create_instance(
+            (cls, "bound_key", key),
+            raise_on_no_context,
+            bound_key=key,
+            bound_value=value,
+        )
+
     @classmethod
     def get_value_bound_class(cls, key, value=None):
         """
@@ -106,5 +444,11 @@ class ValueBoundDataFetcher(DataFetcher):
         otherwise just provide the value as 'key'
         """
         return ValueBoundFetcherFactory.get_fetcher_by_key(
-            cls, key, value=None
+            cls, key, value=value
         )
+
+    def get_shared_cache_key(self, key):
+        if "bound_key" in self.__dict__:
+            # instances of the same class are bound to different values
+            key = f"[{self.bound_key}]:{key}"
+        return super().get_shared_cache_key(key)
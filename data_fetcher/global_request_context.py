@@ -1,4 +1,5 @@
 import contextvars
+from contextlib import ContextDecorator
 
 from django.http import HttpRequest
 
@@ -24,5 +25,78 @@ class GlobalRequest:
         storage.set(self.old_request)
 
 
+class FetcherScope:
+    """
+    Stands in for the request outside of one, e.g. in celery tasks,
+    management commands and scripts. Fetchers and cached functions
+    keep their caches on it, like they do on requests.
+    """
+
+    def __init__(self, reset_every=None):
+        self.reset_every = reset_every
+        self.steps = 0
+
+    def reset(self):
+        """
+        drops all values cached in the scope, and their stats
+
+        stats are keyed by fetcher class, they'd otherwise keep every
+        class generated by get_value_bound_class alive
+        """
+        if hasattr(self, "datafetcher_cache"):
+            self.datafetcher_cache = {}
+        if hasattr(self, "datafetcher_budget"):
+            del self.datafetcher_budget
+        if hasattr(self, "datafetcher_stats"):
+            del self.datafetcher_stats
+
+    def step(self):
+        """
+        marks the end of an iteration,
+        resets the scope every reset_every steps
+        """
+        self.steps += 1
+        if self.reset_every and self.steps % self.reset_every == 0:
+            self.reset()
+
+    def iterate(self, iterable):
+        """
+        yields the iterable's items, stepping after each one
+        """
+        for item in iterable:
+            yield item
+            self.step()
+
+
+class fetcher_scope(ContextDecorator):
+    """
+    Context-manager (or decorator) sharing fetchers and cached values
+    within its block, without constructing an HttpRequest
+
+    with reset_every=N, the scope's caches are dropped every N steps,
+    which keeps memory bounded in long-running jobs:
+
+        with fetcher_scope(reset_every=1000) as scope:
+            for record in scope.iterate(records):
+                ...
+
+    each decorated call gets its own scope
+    """
+
+    def __init__(self, reset_every=None):
+        self.reset_every = reset_every
+
+    def _recreate_cm(self):
+        return type(self)(reset_every=self.reset_every)
+
+    def __enter__(self):
+        self.old_request = storage.get()
+        storage.set(FetcherScope(reset_every=self.reset_every))
+        return storage.get()
+
+    def __exit__(self, *args, **kwargs):
+        storage.set(self.old_request)
+
+
 def get_request():
     return storage.get()
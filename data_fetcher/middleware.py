@@ -1,11 +1,56 @@
+import json
+import logging
+
+from django.conf import settings
+
 from .global_request_context import GlobalRequest
+from .stats import get_request_stats, get_server_timing_header
+
+logger = logging.getLogger("data_fetcher")
 
 
 class GlobalRequestMiddleware:
+    """
+    Optionally reports fetcher stats for each request, with these settings:
+
+    DATA_FETCHER_SERVER_TIMING: adds a Server-Timing header
+    DATA_FETCHER_LOG_STATS: logs a JSON line to the "data_fetcher" logger
+    """
 
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
         with GlobalRequest(request=request):
-            return self.get_response(request)
+            response = self.get_response(request)
+
+        if getattr(settings, "DATA_FETCHER_SERVER_TIMING", False):
+            self.add_server_timing_header(request, response)
+
+        if getattr(settings, "DATA_FETCHER_LOG_STATS", False):
+            self.log_stats(request)
+
+        return response
+
+    def add_server_timing_header(self, request, response):
+        header = get_server_timing_header(request)
+        if not header:
+            return
+        if response.has_header("Server-Timing"):
+            header = f"{response['Server-Timing']}, {header}"
+        response["Server-Timing"] = header
+
+    def log_stats(self, request):
+        stats = [s.as_dict() for s in get_request_stats(request)]
+        if not stats:
+            return
+        logger.info(
+            json.dumps(
+                {
+                    "method": request.method,
+                    "path": request.path,
+                    "data_fetcher_stats": stats,
+                }
+            ),
+            extra={"data_fetcher_stats": stats},
+        )
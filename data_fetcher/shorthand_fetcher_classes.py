@@ -1,23 +1,216 @@
 from collections import defaultdict
+from types import SimpleNamespace
+from weakref import WeakSet
+
+import django
+from django.db import connections
+from django.db.models import F, OuterRef, Q, Subquery, Window
+from django.db.models.functions import RowNumber
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_save,
+)
 
 from .core import DataFetcher
 
+# concrete model -> fetcher classes that load its records
+_fetcher_classes_by_model = defaultdict(WeakSet)
+
+
+class _class_compatible_method:
+    """
+    An instance method that can still be called on the class, for batch
+    loads that used to be classmethods, e.g. Fetcher.batch_load_dict(ids)
+    or super().batch_load_dict(ids) within a classmethod override.
+
+    Class calls run on the request's default-alias instance.
+    """
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.__doc__ = fn.__doc__
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            instance = owner.get_instance()
+        return self.fn.__get__(instance, owner)
+
+
+class AbstractModelFetcher(DataFetcher):
+    """
+    Base class for fetchers that load a model's records
+
+    Saving, deleting or changing the m2m relations of a record
+    evicts only the affected keys, in the request cache and any shared tier
+    """
 
-class AbstractModelByIdFetcher(DataFetcher):
     model = None  # override this part
 
+    # set to False to opt out of signal-driven invalidation
+    invalidate_on_change = True
+
+    # load only these fields, rather than full model instances
+    fields = None
+    # "values" loads compact, read-only namedtuple records (with a pk),
+    # "only" loads deferred model instances
+    projection = "values"
+
+    # related records to join, ignored when fields are declared
+    select_related = ()
+    # prime PrimaryKeyFetcherFactory's fetchers with loaded records,
+    # so later get(pk) calls don't query them again
+    prime_related_fetchers = True
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.model is not None:
+            for model in cls._get_invalidating_models():
+                concrete_model = model._meta.concrete_model
+                _fetcher_classes_by_model[concrete_model].add(cls)
+
     @classmethod
-    def batch_load_dict(cls, ids):
-        records = list(cls.model.objects.filter(pk__in=ids))
-        return {record.id: record for record in records}
+    def _get_invalidating_models(cls):
+        """
+        models whose changes can make this fetcher's values stale
+        """
+        return [cls.model]
 
-    def get_all(self, queryset=None):
+    @classmethod
+    def _get_required_fields(cls):
+        """
+        fields the fetcher needs, even if they aren't declared in fields
+        """
+        return []
+
+    @classmethod
+    def project(cls, queryset):
+        """
+        applies the fetcher's fields/projection to a queryset
+        """
+        if cls.fields is None:
+            if cls.select_related:
+                queryset = queryset.select_related(*cls.select_related)
+            return queryset
+
+        fields = [
+            field
+            for field in dict.fromkeys(
+                [*cls.fields, *cls._get_required_fields()]
+            )
+            if field != "pk"
+        ]
+        if cls.projection == "only":
+            return queryset.only(*fields)
+        elif cls.projection == "values":
+            return queryset.values_list("pk", *fields, named=True)
+        else:
+            raise ValueError(f"unknown projection: {cls.projection}")
+
+    def get_queryset(self):
+        """
+        the queryset batch loads start from,
+        on the fetcher's database alias if it has one
+        """
+        queryset = self.model.objects.all()
+        if self.using is not None:
+            queryset = queryset.using(self.using)
+        return queryset
+
+    def _prime_pk_fetchers(self, records, include_own_model=False):
+        if not self.prime_related_fetchers:
+            return
+
+        if include_own_model:
+            fetcher_cls = PrimaryKeyFetcherFactory.get_model_by_id_fetcher(
+                self.model, self.fields, self.projection
+            )
+            _prime_records(fetcher_cls, records, self.using)
+
+        if self.fields is not None:
+            return
+
+        for path in self.select_related:
+            model = self.model
+            related_records = records
+            for name in path.split("__"):
+                model = model._meta.get_field(name).related_model
+                related_records = [
+                    related
+                    for related in (getattr(r, name) for r in related_records)
+                    if related is not None
+                ]
+                fetcher_cls = PrimaryKeyFetcherFactory.get_model_by_id_fetcher(
+                    model
+                )
+                _prime_records(fetcher_cls, related_records, self.using)
+
+    @classmethod
+    def get_keys_for_records(cls, model, pks, records):
+        """
+        returns the keys of a model's changed records, derived from the
+        records alone. Records can be empty when only their pks are known.
+        These are evicted from the shared tier, even without an instance
+        on the current request
+        """
+        raise NotImplementedError()
+
+    def get_keys_for_changed_records(self, model, pks, records):
+        """
+        returns the keys to evict from this instance when records change,
+        override this to also evict keys found in the instance's cache
+        """
+        return self.get_keys_for_records(model, pks, records)
+
+    @classmethod
+    def get_tracked_fields(cls, model):
+        """
+        fields of model that get_keys_for_records reads from records,
+        their values from before a save are evicted from the shared tier too,
+        e.g. a child's old parent id
+        """
+        return []
+
+
+class AbstractModelByIdFetcher(AbstractModelFetcher):
+    # rows fetched per round-trip when streaming records
+    iterator_chunk_size = 2000
+
+    @_class_compatible_method
+    def batch_load_dict(self, ids):
+        records = list(self.project(self.get_queryset().filter(pk__in=ids)))
+        self._prime_pk_fetchers(records)
+        return {record.pk: record for record in records}
+
+    def iter_all(self, queryset=None, chunk_size=None):
+        """
+        Streams records from the queryset (all records by default),
+        priming each one as it goes
+        """
         if queryset is None:
-            records = [*self.model.objects.all()]
-        for r in records:
-            self.prime(r.pk, r)
+            queryset = self.get_queryset()
+
+        records = self.project(queryset).iterator(
+            chunk_size=chunk_size or self.iterator_chunk_size
+        )
+        for record in records:
+            self.prime(record.pk, record)
+            yield record
+
+    def prime_all(self, queryset=None, chunk_size=None):
+        """
+        Primes the queryset's records without holding a separate list
+        """
+        for _ in self.iter_all(queryset, chunk_size=chunk_size):
+            pass
 
-        return records
+    def get_all(self, queryset=None, chunk_size=None):
+        return list(self.iter_all(queryset, chunk_size=chunk_size))
+
+    @classmethod
+    def get_keys_for_records(cls, model, pks, records):
+        return list(pks)
 
 
 class PrimaryKeyFetcherFactory:
@@ -29,38 +222,552 @@ class PrimaryKeyFetcherFactory:
     datafetcher_classes_by_model = {}
 
     @staticmethod
-    def _create_datafetcher_cls_for_model(model_cls):
+    def _create_datafetcher_cls_for_model(
+        model_cls, fields=None, projection="values"
+    ):
+        name = f"{model_cls.__name__}ByIDFetcher"
+        if fields is not None:
+            name = f"{name}__{projection}__{'__'.join(fields)}"
+
         return type(
-            f"{model_cls.__name__}ByIDFetcher",
+            name,
             (AbstractModelByIdFetcher,),
-            dict(model=model_cls),
+            dict(model=model_cls, fields=fields, projection=projection),
         )
 
     @classmethod
-    def get_model_by_id_fetcher(cls, model_cls):
-        if model_cls in cls.datafetcher_classes_by_model:
-            return cls.datafetcher_classes_by_model[model_cls]
+    def get_model_by_id_fetcher(
+        cls, model_cls, fields=None, projection="values"
+    ):
+        """
+        provide fields to load compact records (or deferred instances,
+        with projection="only") instead of full model instances
+        """
+        if fields is None:
+            dict_key = model_cls
         else:
-            fetcher = cls._create_datafetcher_cls_for_model(model_cls)
-            cls.datafetcher_classes_by_model[model_cls] = fetcher
+            fields = tuple(fields)
+            dict_key = (model_cls, fields, projection)
+
+        if dict_key in cls.datafetcher_classes_by_model:
+            return cls.datafetcher_classes_by_model[dict_key]
+        else:
+            fetcher = cls._create_datafetcher_cls_for_model(
+                model_cls, fields, projection
+            )
+            cls.datafetcher_classes_by_model[dict_key] = fetcher
             return fetcher
 
 
-class AbstractChildModelByAttrFetcher(DataFetcher):
+class AbstractChildModelByAttrFetcher(AbstractModelFetcher):
     """
     Loads many records by a single attr, use this to create child-by-parent-id loaders
     """
 
-    model = None  # override this part
     attr = None  # override this part
 
     @classmethod
-    def batch_load(cls, attr_values):
-        records = list(
-            cls.model.objects.filter(**{f"{cls.attr}__in": attr_values})
+    def _get_required_fields(cls):
+        return [cls.attr]
+
+    def _load_records(self, attr_values):
+        return list(
+            self.project(
+                self.get_queryset().filter(**{f"{self.attr}__in": attr_values})
+            )
         )
+
+    @_class_compatible_method
+    def batch_load(self, attr_values):
+        records = self._load_records(attr_values)
+        self._prime_pk_fetchers(records, include_own_model=True)
         by_attr = defaultdict(list)
         for record in records:
-            by_attr[getattr(record, cls.attr)].append(record)
+            by_attr[getattr(record, self.attr)].append(record)
 
         return [by_attr[attr_val] for attr_val in attr_values]
+
+    @classmethod
+    def get_keys_for_records(cls, model, pks, records):
+        return {getattr(record, cls.attr) for record in records}
+
+    @classmethod
+    def get_tracked_fields(cls, model):
+        return [cls.attr]
+
+    def get_keys_for_changed_records(self, model, pks, records):
+        keys = self.get_keys_for_records(model, pks, records)
+        # records may have moved away from another parent
+        pks = set(pks)
+        keys.update(
+            key
+            for key, children in self._cache.items()
+            if any(child.pk in pks for child in children)
+        )
+        return keys
+
+
+class AbstractTopNChildModelByAttrFetcher(AbstractChildModelByAttrFetcher):
+    """
+    Like AbstractChildModelByAttrFetcher, but only loads the first
+    `limit` children of each parent, in `ordering` order
+
+    The limit is applied in SQL with a ROW_NUMBER() window partitioned by attr,
+    so at most `limit` rows are transferred per key. Databases (or django
+    versions) that can't filter on window functions fall back to a correlated
+    subquery, still in a single query (MySQL doesn't support LIMIT there,
+    it needs django 4.2+ for the window).
+    """
+
+    ordering = None  # override this part, e.g. ["-published_at"]
+    limit = None  # override this part
+
+    def _load_records(self, attr_values):
+        queryset = self.get_queryset()
+        if _can_filter_on_window_functions(queryset.db):
+            order_by = [
+                F(field[1:]).desc()
+                if field.startswith("-")
+                else F(field).asc()
+                for field in self.ordering
+            ]
+            queryset = (
+                queryset.filter(**{f"{self.attr}__in": attr_values})
+                .annotate(
+                    _row_number=Window(
+                        RowNumber(),
+                        partition_by=F(self.attr),
+                        order_by=order_by,
+                    )
+                )
+                .filter(_row_number__lte=self.limit)
+                .order_by("_row_number")
+            )
+            return list(self.project(queryset))
+
+        # pk IN (SELECT pk ... WHERE attr = outer.attr ORDER BY ... LIMIT n)
+        first_children = (
+            self.model._default_manager.filter(
+                **{self.attr: OuterRef(self.attr)}
+            )
+            .order_by(*self.ordering)
+            .values("pk")[: self.limit]
+        )
+        queryset = queryset.filter(
+            **{f"{self.attr}__in": attr_values},
+            pk__in=Subquery(first_children),
+        ).order_by(*self.ordering)
+        return list(self.project(queryset))
+
+
+class AbstractAggregateByAttrFetcher(AbstractModelFetcher):
+    """
+    Loads one aggregate per attr value, with a single GROUP BY query,
+    e.g. the number of books per author_id
+    """
+
+    attr = None  # override this part
+    aggregate = None  # override this part, e.g. Count("id") or Sum("price")
+    default = 0  # value for keys without any rows
+
+    def batch_load(self, attr_values):
+        rows = (
+            self.get_queryset()
+            .filter(**{f"{self.attr}__in": attr_values})
+            # clear the model's default ordering, it would break the grouping
+            .order_by()
+            .values(self.attr)
+            .annotate(_aggregate=self.aggregate)
+            .values_list(self.attr, "_aggregate")
+        )
+        aggregates = dict(rows)
+        return [
+            aggregates.get(attr_value, self.default)
+            for attr_value in attr_values
+        ]
+
+    @classmethod
+    def get_keys_for_records(cls, model, pks, records):
+        return {getattr(record, cls.attr) for record in records}
+
+    @classmethod
+    def get_tracked_fields(cls, model):
+        return [cls.attr]
+
+    def get_keys_for_changed_records(self, model, pks, records):
+        # records may have moved away from any other parent
+        return {*self.get_keys_for_records(model, pks, records), *self._cache}
+
+
+class AbstractModelByCompositeKeyFetcher(AbstractModelFetcher):
+    """
+    Loads single records by tuples of field values,
+    e.g. (user_id, article_id) or (tenant_id, slug)
+
+    All keys are loaded in one query, with a row-value IN clause
+    on PostgreSQL and SQLite, and grouped OR clauses elsewhere
+    """
+
+    key_fields = None  # override this part, e.g. ("user_id", "article_id")
+
+    @classmethod
+    def _get_required_fields(cls):
+        return list(cls.key_fields)
+
+    def batch_load_dict(self, keys):
+        queryset = self.get_queryset()
+        if _supports_row_value_in(queryset.db):
+            queryset = _filter_by_row_values(queryset, self.key_fields, keys)
+        else:
+            queryset = queryset.filter(
+                _get_grouped_key_filter(self.key_fields, keys)
+            )
+
+        records = list(self.project(queryset))
+        self._prime_pk_fetchers(records, include_own_model=True)
+        return {
+            tuple(getattr(record, field) for field in self.key_fields): record
+            for record in records
+        }
+
+    @classmethod
+    def get_keys_for_records(cls, model, pks, records):
+        return {
+            tuple(getattr(record, field) for field in cls.key_fields)
+            for record in records
+        }
+
+    @classmethod
+    def get_tracked_fields(cls, model):
+        return list(cls.key_fields)
+
+    def get_keys_for_changed_records(self, model, pks, records):
+        keys = self.get_keys_for_records(model, pks, records)
+        # records' key fields may have changed
+        pks = set(pks)
+        keys.update(
+            key
+            for key, record in self._cache.items()
+            if record is not None and record.pk in pks
+        )
+        return keys
+
+
+def _supports_row_value_in(alias):
+    return connections[alias].vendor in ("postgresql", "sqlite")
+
+
+def _filter_by_row_values(queryset, key_fields, keys):
+    """
+    filters on (col_1, col_2) IN (VALUES (%s, %s), ...)
+    """
+    connection = connections[queryset.db]
+    model = queryset.model
+    quote_name = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in key_fields]
+
+    columns = ", ".join(
+        f"{quote_name(model._meta.db_table)}.{quote_name(field.column)}"
+        for field in fields
+    )
+    row_placeholder = f"({', '.join(['%s'] * len(fields))})"
+    params = [
+        field.get_db_prep_value(value, connection)
+        for key in keys
+        for field, value in zip(fields, key)
+    ]
+    return queryset.extra(
+        where=[
+            f"({columns}) IN "
+            f"(VALUES {', '.join([row_placeholder] * len(keys))})"
+        ],
+        params=params,
+    )
+
+
+def _get_grouped_key_filter(key_fields, keys):
+    """
+    groups keys by all but their last field,
+    e.g. (user_id=1 AND article_id IN (1, 2)) OR (user_id=2 AND ...)
+    """
+    *prefix_fields, last_field = key_fields
+    last_values_by_prefix = defaultdict(list)
+    for *prefix, last_value in keys:
+        last_values_by_prefix[tuple(prefix)].append(last_value)
+
+    key_filter = Q(pk__in=[])
+    for prefix, last_values in last_values_by_prefix.items():
+        key_filter |= Q(
+            **dict(zip(prefix_fields, prefix)),
+            **{f"{last_field}__in": last_values},
+        )
+    return key_filter
+
+
+def _can_filter_on_window_functions(alias):
+    connection = connections[alias]
+    return (
+        django.VERSION >= (4, 2) and connection.features.supports_over_clause
+    )
+
+
+class AbstractManyToManyFetcher(AbstractModelFetcher):
+    """
+    Loads the related records of a many-to-many field, by source-record id
+
+    e.g. with model=Book and field_name="tags", get(book_id) returns a list
+    of the book's tags. The through-table is queried once per batch, then
+    related records are loaded through their model's primary-key fetcher,
+    so records shared by many sources are only instantiated once.
+    fields/projection apply to the related records.
+
+    The shared tier only stores related ids per source, related records are
+    resolved through the primary-key fetcher, which is invalidated on its own.
+    """
+
+    field_name = None  # override this part, reverse relations work too
+
+    @classmethod
+    def _get_relation(cls):
+        """
+        returns the related model, the through model
+        and the through model's source and target columns
+        """
+        field = cls.model._meta.get_field(cls.field_name)
+        if field.concrete:
+            m2m_field = field
+            source_name = m2m_field.m2m_field_name()
+            target_name = m2m_field.m2m_reverse_field_name()
+        else:
+            # reverse relation, e.g. Tag.book_set
+            m2m_field = field.field
+            source_name = m2m_field.m2m_reverse_field_name()
+            target_name = m2m_field.m2m_field_name()
+
+        through = m2m_field.remote_field.through
+        return (
+            field.related_model,
+            through,
+            through._meta.get_field(source_name).attname,
+            through._meta.get_field(target_name).attname,
+        )
+
+    @classmethod
+    def _get_invalidating_models(cls):
+        related_model, through, _, _ = cls._get_relation()
+        # rows of explicit through models can be saved directly,
+        # without any m2m_changed signal
+        return [cls.model, related_model, through]
+
+    def batch_load(self, source_ids):
+        _, through, source_col, target_col = self._get_relation()
+        rows = (
+            through._default_manager.db_manager(self.using)
+            .filter(**{f"{source_col}__in": source_ids})
+            .order_by("pk")
+            .values_list(source_col, target_col)
+        )
+        target_ids_by_source = defaultdict(list)
+        for source_id, target_id in rows:
+            target_ids_by_source[source_id].append(target_id)
+
+        return self._get_related_records(
+            [target_ids_by_source[source_id] for source_id in source_ids]
+        )
+
+    def _get_related_records(self, target_id_lists):
+        """
+        loads lists of related ids in a single batch
+        """
+        related_model = self._get_relation()[0]
+        related_fetcher = PrimaryKeyFetcherFactory.get_model_by_id_fetcher(
+            related_model, self.fields, self.projection
+        ).get_instance(using=self.using)
+        related_by_id = related_fetcher.get_many_as_dict(
+            list(
+                {
+                    target_id
+                    for target_ids in target_id_lists
+                    for target_id in target_ids
+                }
+            )
+        )
+        # related records may have been deleted since ids were shared
+        return [
+            [
+                related_by_id[target_id]
+                for target_id in target_ids
+                if related_by_id[target_id] is not None
+            ]
+            for target_ids in target_id_lists
+        ]
+
+    def dump_shared_values(self, values):
+        return [[record.pk for record in records] for records in values]
+
+    def load_shared_values(self, values):
+        return self._get_related_records(values)
+
+    @classmethod
+    def get_keys_for_records(cls, model, pks, records):
+        concrete_model = model._meta.concrete_model
+        if concrete_model is cls.model._meta.concrete_model:
+            return set(pks)
+        _, through, source_col, _ = cls._get_relation()
+        if concrete_model is through._meta.concrete_model:
+            return {getattr(record, source_col) for record in records}
+        return set()
+
+    @classmethod
+    def get_tracked_fields(cls, model):
+        _, through, source_col, _ = cls._get_relation()
+        if model._meta.concrete_model is through._meta.concrete_model:
+            return [source_col]
+        return []
+
+    def get_keys_for_changed_records(self, model, pks, records):
+        concrete_model = model._meta.concrete_model
+        keys = self.get_keys_for_records(model, pks, records)
+        related_model = self._get_relation()[0]
+        if concrete_model is related_model._meta.concrete_model:
+            pks = set(pks)
+            keys.update(
+                key
+                for key, related_records in self._cache.items()
+                if any(record.pk in pks for record in related_records)
+            )
+        return keys
+
+
+class ManyToManyFetcherFactory:
+    """
+    Like PrimaryKeyFetcherFactory, but for AbstractManyToManyFetcher classes
+    """
+
+    datafetcher_classes_by_field = {}
+
+    @staticmethod
+    def _create_datafetcher_cls_for_field(model_cls, field_name):
+        return type(
+            f"{model_cls.__name__}__{field_name}__Fetcher",
+            (AbstractManyToManyFetcher,),
+            dict(model=model_cls, field_name=field_name),
+        )
+
+    @classmethod
+    def get_many_to_many_fetcher(cls, model_cls, field_name):
+        dict_key = (model_cls, field_name)
+        if dict_key in cls.datafetcher_classes_by_field:
+            return cls.datafetcher_classes_by_field[dict_key]
+        else:
+            fetcher = cls._create_datafetcher_cls_for_field(
+                model_cls, field_name
+            )
+            cls.datafetcher_classes_by_field[dict_key] = fetcher
+            return fetcher
+
+
+def _prime_records(fetcher_cls, records, using=None):
+    fetcher = fetcher_cls.get_instance(using=using)
+    for record in records:
+        # keep already-cached instances, so identity checks still hold
+        fetcher.prime(record.pk, record, overwrite=False)
+
+
+def _get_shared_tier_fetcher_classes(model):
+    return [
+        fetcher_cls
+        for fetcher_cls in _fetcher_classes_by_model.get(
+            model._meta.concrete_model, ()
+        )
+        if fetcher_cls.invalidate_on_change
+        and fetcher_cls.shared_cache_alias is not None
+    ]
+
+
+def _evict_changed_records(model, pks, records=(), old_records=()):
+    """
+    old_records hold the tracked fields' values from before a save,
+    only for fetchers with a shared tier
+    """
+    fetcher_classes = _fetcher_classes_by_model.get(model._meta.concrete_model)
+    if not fetcher_classes:
+        return
+
+    for fetcher_cls in list(fetcher_classes):
+        if not fetcher_cls.invalidate_on_change:
+            continue
+        if pks is None:
+            # we don't know which records changed, so the shared tier
+            # can't be evicted, e.g. after an m2m relation's clear()
+            fetcher_cls.clear()
+            continue
+
+        # only instances already on the request, creating instances
+        # (and their stats) for every fetcher class on every save is wasteful,
+        # and value-bound fetchers can't be created without their value
+        for fetcher in fetcher_cls.get_request_instances():
+            fetcher.evict(
+                fetcher.get_keys_for_changed_records(model, pks, records)
+            )
+        # the shared tier outlives requests, so it's evicted regardless
+        if fetcher_cls.shared_cache_alias is not None:
+            fetcher_cls.evict_from_shared_cache(
+                fetcher_cls.get_keys_for_records(
+                    model, pks, [*records, *old_records]
+                )
+            )
+
+
+def _on_record_saving(sender, instance, using, **kwargs):
+    if instance._state.adding or instance.pk is None:
+        return
+
+    fields = {
+        field: None
+        for fetcher_cls in _get_shared_tier_fetcher_classes(sender)
+        for field in fetcher_cls.get_tracked_fields(sender)
+    }
+    if not fields:
+        return
+
+    # the shared tier can't be scanned for keys like the request cache,
+    # so the record's old values are read before they're overwritten
+    old_values = (
+        sender._base_manager.using(using)
+        .filter(pk=instance.pk)
+        .values(*fields)
+        .first()
+    )
+    if old_values is not None:
+        instance._data_fetcher_old_record = SimpleNamespace(**old_values)
+
+
+def _on_record_saved_or_deleted(sender, instance, **kwargs):
+    old_record = instance.__dict__.pop("_data_fetcher_old_record", None)
+    _evict_changed_records(
+        sender,
+        [instance.pk],
+        [instance],
+        old_records=[old_record] if old_record is not None else [],
+    )
+
+
+def _on_m2m_changed(
+    sender, instance, action, reverse, model, pk_set, **kwargs
+):
+    if not action.startswith("post_"):
+        return
+
+    _evict_changed_records(type(instance), [instance.pk], [instance])
+    _evict_changed_records(model, pk_set)
+
+
+pre_save.connect(_on_record_saving, dispatch_uid="data_fetcher_pre_save")
+post_save.connect(
+    _on_record_saved_or_deleted, dispatch_uid="data_fetcher_post_save"
+)
+post_delete.connect(
+    _on_record_saved_or_deleted, dispatch_uid="data_fetcher_post_delete"
+)
+m2m_changed.connect(_on_m2m_changed, dispatch_uid="data_fetcher_m2m_changed")
@@ -0,0 +1,109 @@
+import re
+
+from .global_request_context import get_request
+
+
+class FetcherStats:
+    """
+    Counters for a single fetcher class (or cached function)
+    within a single request
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.batch_calls = 0
+        self.batch_keys = 0
+        self.largest_batch = 0
+        # batches small enough to count towards N+1 detection
+        self.small_batches = 0
+        # seconds spent in batch-load (or cached function) calls
+        self.load_time = 0.0
+        # values dropped to keep the request within its memory budget
+        self.evictions = 0
+
+    def record_batch(self, num_keys, duration):
+        self.batch_calls += 1
+        self.batch_keys += num_keys
+        self.largest_batch = max(self.largest_batch, num_keys)
+        self.load_time += duration
+
+    @property
+    def keys_per_batch(self):
+        if not self.batch_calls:
+            return 0
+        return self.batch_keys / self.batch_calls
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "batch_calls": self.batch_calls,
+            "batch_keys": self.batch_keys,
+            "largest_batch": self.largest_batch,
+            "keys_per_batch": round(self.keys_per_batch, 2),
+            "load_time_ms": round(self.load_time * 1000, 3),
+            "evictions": self.evictions,
+        }
+
+    def __repr__(self):
+        return f"<FetcherStats {self.as_dict()}>"
+
+
+def _get_name(owner):
+    return getattr(owner, "__qualname__", None) or repr(owner)
+
+
+def get_stats_for(owner):
+    """
+    returns the current request's stats for a fetcher class or function
+
+    outside of a request, returns stats that aren't recorded anywhere
+    """
+    request = get_request()
+    if request is None:
+        return FetcherStats(_get_name(owner))
+
+    try:
+        stats_by_owner = request.datafetcher_stats
+    except AttributeError:
+        stats_by_owner = request.datafetcher_stats = {}
+
+    if owner not in stats_by_owner:
+        stats_by_owner[owner] = FetcherStats(_get_name(owner))
+
+    return stats_by_owner[owner]
+
+
+def get_request_stats(request=None):
+    """
+    returns stats for every fetcher and cached function used in the request,
+    ordered by time spent loading
+    """
+    if request is None:
+        request = get_request()
+
+    stats_by_owner = getattr(request, "datafetcher_stats", {})
+    return sorted(
+        stats_by_owner.values(), key=lambda s: s.load_time, reverse=True
+    )
+
+
+def get_server_timing_header(request=None):
+    entries = []
+    for stats in get_request_stats(request):
+        if not (stats.hits or stats.misses):
+            continue
+        metric_name = re.sub(r"[^A-Za-z0-9_-]", "_", stats.name)
+        description = (
+            f"{stats.hits} hits, {stats.misses} misses, "
+            f"{stats.batch_calls} batches"
+        )
+        if stats.evictions:
+            description += f", {stats.evictions} evicted"
+        entries.append(
+            f'df-{metric_name};dur={stats.load_time * 1000:.3f};desc="{description}"'
+        )
+    return ", ".join(entries)
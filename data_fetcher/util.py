@@ -1,5 +1,10 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+
 # from data_fetcher.middleware import get_request
-from .global_request_context import GlobalRequest, get_request
+from .global_request_context import GlobalRequest, fetcher_scope, get_request
 
 
 class MissingRequestContextException(Exception):
@@ -31,6 +36,9 @@ def clear_request_caches():
     if request and hasattr(request, "datafetcher_cache"):
         # reset the cache to an empty dict
         request.datafetcher_cache = {}
+    if request and hasattr(request, "datafetcher_budget"):
+        # the budget tracked the dropped values, start over
+        del request.datafetcher_budget
 
 
 def clear_datafetchers():
@@ -39,3 +47,38 @@ def clear_datafetchers():
     old API, prefer clear_request_caches()
     """
     clear_request_caches()
+
+
+def in_atomic_block():
+    """
+    whether any of this thread's DB connections is inside a transaction
+    """
+    return any(connection.in_atomic_block for connection in connections.all())
+
+
+def run_concurrently(fns, max_workers):
+    """
+    Calls each function in a thread pool, returns their results in order
+
+    Threads share the caller's context (e.g. the global request),
+    and each one closes its own DB connections when done
+
+    Inside a transaction, the functions are called in this thread instead:
+    other threads' connections can't see its uncommitted writes
+    (and SQLite would raise on its locked tables)
+    """
+    if in_atomic_block():
+        return [fn() for fn in fns]
+
+    def run_in_thread(context, fn):
+        try:
+            return context.run(fn)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(run_in_thread, contextvars.copy_context(), fn)
+            for fn in fns
+        ]
+        return [future.result() for future in futures]
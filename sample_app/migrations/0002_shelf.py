@@ -0,0 +1,65 @@
+# Generated by Django 4.2 on 2026-10-16 23:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sample_app", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Shelf",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=250)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ShelfEntry",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("position", models.IntegerField(default=0)),
+                (
+                    "book",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="sample_app.book",
+                    ),
+                ),
+                (
+                    "shelf",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="sample_app.shelf",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="shelf",
+            name="books",
+            field=models.ManyToManyField(
+                through="sample_app.ShelfEntry", to="sample_app.book"
+            ),
+        ),
+    ]
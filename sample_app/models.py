@@ -21,3 +21,14 @@ class Book(models.Model):
     )
     title = models.CharField(max_length=250)
     tags = models.ManyToManyField(Tag)
+
+
+class Shelf(models.Model):
+    name = models.CharField(max_length=250)
+    books = models.ManyToManyField(Book, through="ShelfEntry")
+
+
+class ShelfEntry(models.Model):
+    shelf = models.ForeignKey(Shelf, on_delete=models.CASCADE)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    position = models.IntegerField(default=0)
@@ -79,7 +79,13 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": f"{BASE_DIR}/db.sqlite3",
-    }
+    },
+    # stands in for a read-replica,
+    # tests get a separate (unreplicated) database for it
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": f"{BASE_DIR}/db.sqlite3",
+    },
 }
 
 
@@ -107,3 +113,5 @@ IS_TEST = False
 if "test" in sys.argv or any("pytest" in arg for arg in sys.argv):
     IS_TEST = True
     TEST_RUNNER = "pytest_test_runner.PytestTestRunner"
+    # fail tests that let fetchers degrade into single-key loads
+    DATA_FETCHER_N_PLUS_ONE = "raise"
@@ -18,11 +18,21 @@ from django.contrib import admin
 from django.contrib.auth.views import LoginView
 from django.urls import path
 
-from .views import async_view_with_loaders, edit_book, view_with_loaders
+from .views import (
+    async_view_with_loaders,
+    edit_book,
+    native_async_view_with_loaders,
+    view_with_loaders,
+)
 
 urlpatterns = [
     path("login/", LoginView.as_view(), name="login"),
     path("book/<int:pk>/edit/", edit_book, name="edit-book"),
     path("view1", view_with_loaders, name="view1"),
     path("async_view1", async_view_with_loaders, name="async_view1"),
+    path(
+        "native_async_view1",
+        native_async_view_with_loaders,
+        name="native_async_view1",
+    ),
 ]
@@ -1,8 +1,10 @@
+import asyncio
+
 from django.http.response import HttpResponse
 
 from asgiref.sync import sync_to_async
 
-from data_fetcher import PrimaryKeyFetcherFactory
+from data_fetcher import AsyncDataFetcher, PrimaryKeyFetcherFactory
 
 from .models import Author, Book, Tag
 
@@ -49,3 +51,26 @@ def view_with_loaders(request):
 async def async_view_with_loaders(request):
     resp = await sync_to_async(view_with_loaders)(request)
     return resp
+
+
+class AsyncWatchedAuthorByIdFetcher(AsyncDataFetcher, AuthorByIdFetcher):
+    def batch_load_dict(self, keys):
+        spyable_func(keys)
+        return super().batch_load_dict(keys)
+
+
+async def native_async_view_with_loaders(request):
+    author_ids = await sync_to_async(list)(
+        Author.objects.values_list("id", flat=True)
+    )
+    fetcher = AsyncWatchedAuthorByIdFetcher.get_instance()
+
+    async def get_author_name(author_id):
+        author = await fetcher.aget(author_id)
+        return author.first_name
+
+    # concurrent coroutines are batched into a single query
+    names = await asyncio.gather(*[get_author_name(id) for id in author_ids])
+    assert len(names) == len(author_ids)
+
+    return HttpResponse("ok")
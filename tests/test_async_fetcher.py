@@ -0,0 +1,177 @@
+import asyncio
+from unittest.mock import MagicMock
+
+from django.contrib.auth import get_user_model
+
+import pytest
+from asgiref.sync import async_to_sync
+
+from data_fetcher import AsyncDataFetcher, PrimaryKeyFetcherFactory
+from data_fetcher.util import GlobalRequest
+
+
+def test_concurrent_coroutines_share_a_batch():
+    spy = MagicMock()
+
+    class TestFetcher(AsyncDataFetcher):
+        async def batch_load_dict(self, keys):
+            spy(keys)
+            return {key: key * 2 for key in keys}
+
+    async def get_value(key):
+        return await TestFetcher.get_instance().aget(key)
+
+    async def main():
+        values = await asyncio.gather(*[get_value(i) for i in range(5)])
+        assert values == [0, 2, 4, 6, 8]
+
+        # cached values don't trigger a new batch
+        assert await get_value(3) == 6
+        assert await TestFetcher.get_instance().aget_many([1, 2, 7]) == [
+            2,
+            4,
+            14,
+        ]
+
+    with GlobalRequest():
+        async_to_sync(main)()
+
+    assert spy.call_args_list == [
+        (([0, 1, 2, 3, 4],),),
+        (([7],),),
+    ]
+
+
+def test_in_flight_loads_are_shared():
+    spy = MagicMock()
+    release = None
+
+    class TestFetcher(AsyncDataFetcher):
+        async def batch_load(self, keys):
+            spy(keys)
+            await release.wait()
+            return [key * 2 for key in keys]
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        fetcher = TestFetcher.get_instance()
+
+        first = asyncio.ensure_future(fetcher.aget(1))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        # the first batch is now in flight
+        second = asyncio.ensure_future(fetcher.aget_many([1, 2]))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+        release.set()
+        assert await first == 2
+        assert await second == [2, 4]
+
+    with GlobalRequest():
+        async_to_sync(main)()
+
+    assert spy.call_args_list == [
+        (([1],),),
+        (([2],),),
+    ]
+
+
+def test_batch_errors_propagate_to_all_waiters():
+    class TestFetcher(AsyncDataFetcher):
+        async def batch_load(self, keys):
+            raise ValueError("oops")
+
+    async def main():
+        fetcher = TestFetcher.get_instance()
+        results = await asyncio.gather(
+            fetcher.aget(1), fetcher.aget(2), return_exceptions=True
+        )
+        assert all(isinstance(r, ValueError) for r in results)
+        # failed keys are not cached, so they can be retried
+        assert fetcher._futures == {}
+        with pytest.raises(ValueError):
+            await fetcher.aget(1)
+
+    with GlobalRequest():
+        async_to_sync(main)()
+
+
+def test_async_fetcher_with_sync_batch_load(django_assert_num_queries):
+    users = [
+        get_user_model().objects.create(username=f"test_user_{i}")
+        for i in range(5)
+    ]
+    user_ids = [user.id for user in users]
+
+    UserByPKFetcher = PrimaryKeyFetcherFactory.get_model_by_id_fetcher(
+        get_user_model()
+    )
+
+    class AsyncUserFetcher(AsyncDataFetcher, UserByPKFetcher):
+        pass
+
+    async def main():
+        fetcher = AsyncUserFetcher.get_instance()
+        fetcher.enqueue_keys(user_ids[3:])
+        await fetcher.aprefetch_keys(user_ids[:3])
+        # queued keys are loaded along with the batch
+        assert set(fetcher._cache) == set(user_ids)
+        assert await fetcher.aget_many_as_dict(user_ids) == {
+            user.id: user for user in users
+        }
+
+    with GlobalRequest():
+        with django_assert_num_queries(1):
+            async_to_sync(main)()
+
+
+def test_cancelling_a_waiter_keeps_the_load_going():
+    spy = MagicMock()
+
+    class TestFetcher(AsyncDataFetcher):
+        async def batch_load_dict(self, keys):
+            spy(keys)
+            await asyncio.sleep(0.05)
+            return {key: key * 2 for key in keys}
+
+    async def main():
+        fetcher = TestFetcher.get_instance()
+        first = asyncio.ensure_future(fetcher.aget(1))
+        second = asyncio.ensure_future(fetcher.aget_many([1, 2]))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == [2, 4]
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(fetcher.aget(5), 0.01)
+        # the timed-out load is still in flight, and shared
+        assert await fetcher.aget(5) == 10
+
+    with GlobalRequest():
+        async_to_sync(main)()
+
+    assert spy.call_args_list == [(([1, 2],),), (([5],),)]
+
+
+def test_in_flight_batches_are_referenced():
+    class TestFetcher(AsyncDataFetcher):
+        async def batch_load_dict(self, keys):
+            await asyncio.sleep(0.01)
+            return {key: key * 2 for key in keys}
+
+    async def main():
+        fetcher = TestFetcher.get_instance()
+        waiter = asyncio.ensure_future(fetcher.aget(1))
+        # the waiter schedules the batch, which is dispatched on the next tick
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert len(fetcher._tasks) == 1
+        assert await waiter == 2
+        assert fetcher._tasks == set()
+
+    with GlobalRequest():
+        async_to_sync(main)()
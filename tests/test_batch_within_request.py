@@ -0,0 +1,83 @@
+from unittest.mock import MagicMock
+
+from data_fetcher import DataFetcher, batch_within_request
+from data_fetcher.util import GlobalRequest
+from sample_app import data_factories
+from sample_app.models import Author
+
+
+def test_batch_decorator():
+    spy = MagicMock()
+
+    @batch_within_request
+    def double(keys):
+        spy(keys)
+        return {key: key * 2 for key in keys}
+
+    with GlobalRequest():
+        double.prefetch([1, 2, 3])
+        assert double(1) == 2
+        assert double(3) == 6
+        assert double.get_many([2, 4]) == [4, 8]
+        assert spy.call_args_list == [(([1, 2, 3],),), (([4],),)]
+
+    with GlobalRequest():
+        assert double(1) == 2
+        assert spy.call_count == 3
+
+    # outside of a request, values are loaded but not cached
+    assert double(1) == 2
+    assert spy.call_count == 4
+
+
+def test_batch_decorator_lazy_values():
+    spy = MagicMock()
+
+    @batch_within_request
+    def double(keys):
+        spy(sorted(keys))
+        return {key: key * 2 for key in keys}
+
+    with GlobalRequest():
+        lazy_values = [double.get_lazy(key) for key in [1, 2, 3]]
+        lazy_list = double.get_many_lazy([4, 5])
+        spy.assert_not_called()
+
+        assert [value.get() for value in lazy_values] == [2, 4, 6]
+        assert lazy_list.get() == [8, 10]
+        spy.assert_called_once_with([1, 2, 3, 4, 5])
+
+
+def test_batch_decorator_fetcher_class():
+    spy = MagicMock()
+
+    @batch_within_request(max_batch_size=2)
+    def double(keys):
+        spy(keys)
+        return {key: key * 2 for key in keys}
+
+    assert issubclass(double.fetcher_class, DataFetcher)
+    assert double.fetcher_class.max_batch_size == 2
+
+    with GlobalRequest():
+        assert double.get_many([1, 2, 3]) == [2, 4, 6]
+        assert spy.call_args_list == [(([1, 2],),), (([3],),)]
+
+        assert double.fetcher_class.get_instance().get(1) == 2
+        double.cache_clear()
+        double(1)
+        assert spy.call_count == 3
+
+
+def test_batch_decorator_with_models(django_assert_num_queries):
+    authors = data_factories.AuthorFactory.create_batch(3)
+
+    @batch_within_request
+    def get_author(ids):
+        return Author.objects.in_bulk(ids)
+
+    with GlobalRequest():
+        with django_assert_num_queries(1):
+            get_author.prefetch([a.id for a in authors])
+            assert [get_author(a.id) for a in authors] == authors
+            assert get_author(authors[0].id) is get_author(authors[0].id)
@@ -0,0 +1,222 @@
+"""
+Benchmarks, disabled by default (they run once, as smoke tests)
+
+run them with:
+    pytest tests/test_benchmarks.py --benchmark-enable
+
+and compare releases with --benchmark-autosave / --benchmark-compare
+"""
+
+import pytest
+
+from data_fetcher import (
+    AbstractChildModelByAttrFetcher,
+    DataFetcher,
+    cache_within_request,
+)
+from data_fetcher.util import GlobalRequest
+from sample_app.models import Author, Book
+
+SIZES = [1, 1_000, 100_000]
+ORM_SIZES = [1, 100, 1_000]
+
+
+class DoublingFetcher(DataFetcher):
+    def batch_load_dict(self, keys):
+        return {key: key * 2 for key in keys}
+
+
+class BookByAuthorIdFetcher(AbstractChildModelByAttrFetcher):
+    model = Book
+    attr = "author_id"
+    # stay under SQLite's variable limit
+    max_batch_size = 500
+
+
+@cache_within_request
+def cached_double(x):
+    return x * 2
+
+
+def double(x):
+    return x * 2
+
+
+@pytest.fixture(autouse=True)
+def disable_n_plus_one_detection(settings):
+    # single-key benchmarks repeat single-key batches on purpose
+    settings.DATA_FETCHER_N_PLUS_ONE = None
+
+
+@pytest.fixture
+def request_context():
+    with GlobalRequest():
+        yield
+
+
+@pytest.mark.benchmark(group="get")
+@pytest.mark.parametrize("size", SIZES)
+def test_plain_dict_lookup_baseline(benchmark, size):
+    cache = {key: key * 2 for key in range(size)}
+
+    def lookup_all():
+        for key in range(size):
+            cache[key]
+
+    benchmark(lookup_all)
+
+
+@pytest.mark.benchmark(group="get")
+@pytest.mark.parametrize("size", SIZES)
+def test_get_cache_hit(benchmark, request_context, size):
+    fetcher = DoublingFetcher.get_instance()
+    fetcher.prefetch_keys(range(size))
+
+    def get_all():
+        for key in range(size):
+            fetcher.get(key)
+
+    benchmark(get_all)
+
+
+@pytest.mark.benchmark(group="get")
+@pytest.mark.parametrize("size", SIZES)
+def test_get_cache_hit_after_enqueue(benchmark, request_context, size):
+    """
+    the template-loop case: lots of get() calls after a large enqueue_keys
+    """
+
+    def setup():
+        DoublingFetcher.clear()
+        fetcher = DoublingFetcher.get_instance()
+        fetcher.enqueue_keys(range(size))
+        return (fetcher,), {}
+
+    def get_all(fetcher):
+        for key in range(size):
+            fetcher.get(key)
+
+    benchmark.pedantic(get_all, setup=setup, rounds=10)
+
+
+@pytest.mark.benchmark(group="get_many")
+@pytest.mark.parametrize("size", SIZES)
+def test_get_many_cold(benchmark, request_context, size):
+    keys = list(range(size))
+
+    def setup():
+        DoublingFetcher.clear()
+        return (DoublingFetcher.get_instance(),), {}
+
+    benchmark.pedantic(
+        lambda fetcher: fetcher.get_many(keys), setup=setup, rounds=10
+    )
+
+
+@pytest.mark.benchmark(group="get_many")
+@pytest.mark.parametrize("size", SIZES)
+def test_get_many_cached(benchmark, request_context, size):
+    keys = list(range(size))
+    fetcher = DoublingFetcher.get_instance()
+    fetcher.prefetch_keys(keys)
+
+    benchmark(fetcher.get_many, keys)
+
+
+@pytest.mark.benchmark(group="get_lazy")
+@pytest.mark.parametrize("size", SIZES)
+def test_get_lazy(benchmark, request_context, size):
+    def setup():
+        DoublingFetcher.clear()
+        return (DoublingFetcher.get_instance(),), {}
+
+    def get_all_lazily(fetcher):
+        lazy_values = [fetcher.get_lazy(key) for key in range(size)]
+        for lazy_value in lazy_values:
+            lazy_value.get()
+
+    benchmark.pedantic(get_all_lazily, setup=setup, rounds=10)
+
+
+@pytest.mark.benchmark(group="get_instance")
+@pytest.mark.parametrize("size", SIZES)
+def test_get_instance(benchmark, request_context, size):
+    def get_instances():
+        for _ in range(size):
+            DoublingFetcher.get_instance()
+
+    benchmark(get_instances)
+
+
+@pytest.mark.benchmark(group="cache_within_request")
+@pytest.mark.parametrize("size", SIZES)
+def test_plain_function_baseline(benchmark, size):
+    def call_all():
+        for key in range(size):
+            double(key)
+
+    benchmark(call_all)
+
+
+@pytest.mark.benchmark(group="cache_within_request")
+@pytest.mark.parametrize("size", SIZES)
+def test_cache_within_request_hit(benchmark, request_context, size):
+    for key in range(size):
+        cached_double(key)
+
+    def call_all():
+        for key in range(size):
+            cached_double(key)
+
+    benchmark(call_all)
+
+
+@pytest.fixture
+def authors_with_books(request):
+    num_authors = request.param
+    Author.objects.bulk_create(
+        [Author(first_name="a", last_name="b") for _ in range(num_authors)]
+    )
+    authors = list(Author.objects.all())
+    Book.objects.bulk_create(
+        [
+            Book(author=author, title=f"book {i}")
+            for author in authors
+            for i in range(3)
+        ]
+    )
+    return authors
+
+
+@pytest.mark.benchmark(group="orm")
+@pytest.mark.parametrize("authors_with_books", ORM_SIZES, indirect=True)
+def test_naive_orm_loop(benchmark, authors_with_books):
+    def count_titles():
+        authors = Author.objects.all()
+        return sum(len(a.books.all()) for a in authors)
+
+    assert benchmark(count_titles) == 3 * len(authors_with_books)
+
+
+@pytest.mark.benchmark(group="orm")
+@pytest.mark.parametrize("authors_with_books", ORM_SIZES, indirect=True)
+def test_prefetch_related_loop(benchmark, authors_with_books):
+    def count_titles():
+        authors = Author.objects.prefetch_related("books")
+        return sum(len(a.books.all()) for a in authors)
+
+    assert benchmark(count_titles) == 3 * len(authors_with_books)
+
+
+@pytest.mark.benchmark(group="orm")
+@pytest.mark.parametrize("authors_with_books", ORM_SIZES, indirect=True)
+def test_fetcher_loop(benchmark, request_context, authors_with_books):
+    def count_titles():
+        # start each round cold, so books are actually loaded
+        BookByAuthorIdFetcher.clear()
+        authors = Author.objects.all()
+        fetcher = BookByAuthorIdFetcher.get_instance()
+        fetcher.prefetch_keys([a.id for a in authors])
+        return sum(len(fetcher.get(a.id)) for a in authors)
+
+    assert benchmark(count_titles) == 3 * len(authors_with_books)
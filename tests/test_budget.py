@@ -0,0 +1,131 @@
+from unittest.mock import MagicMock
+
+import pytest
+from asgiref.sync import async_to_sync
+
+from data_fetcher import AsyncDataFetcher, DataFetcher, cache_within_request
+from data_fetcher.budget import get_approximate_size, get_request_budget
+from data_fetcher.stats import get_server_timing_header, get_stats_for
+from data_fetcher.util import GlobalRequest, clear_request_caches
+
+
+class DoublingFetcher(DataFetcher):
+    def batch_load_dict(self, keys):
+        return {key: key * 2 for key in keys}
+
+
+class TriplingFetcher(DataFetcher):
+    def batch_load_dict(self, keys):
+        return {key: key * 3 for key in keys}
+
+
+class AsyncFetcher(AsyncDataFetcher):
+    async def batch_load_dict(self, keys):
+        return {key: key * 2 for key in keys}
+
+
+def test_no_budget_by_default():
+    with GlobalRequest():
+        assert get_request_budget() is None
+        assert DoublingFetcher.get_instance()._budget is None
+
+
+def test_budget_evicts_least_recently_used_values(settings):
+    settings.DATA_FETCHER_MAX_ENTRIES = 3
+    spy = MagicMock()
+
+    @cache_within_request
+    def square(x):
+        spy(x)
+        return x * x
+
+    with GlobalRequest():
+        doubling_fetcher = DoublingFetcher.get_instance()
+        tripling_fetcher = TriplingFetcher.get_instance()
+
+        doubling_fetcher.prefetch_keys([1, 2])
+        square(3)
+        # 2 is used again, so 1 is the least recently used value
+        assert doubling_fetcher.get(2) == 4
+        assert tripling_fetcher.get(1) == 3
+
+        assert doubling_fetcher._cache == {2: 4}
+        assert get_stats_for(DoublingFetcher).evictions == 1
+        assert len(get_request_budget()) == 3
+
+        # evicted values are simply re-loaded
+        assert doubling_fetcher.get(1) == 2
+        square(4)
+        assert len(get_request_budget()) == 3
+        assert get_request_budget().evictions == 3
+
+        # square(3) was evicted by now
+        square(3)
+        assert spy.call_args_list == [((3,),), ((4,),), ((3,),)]
+
+
+def test_batches_larger_than_the_budget(settings):
+    settings.DATA_FETCHER_MAX_ENTRIES = 2
+
+    with GlobalRequest():
+        fetcher = DoublingFetcher.get_instance()
+        fetcher.prime(1, "primed")
+        keys = [1, 2, 3, 4, 5]
+        assert fetcher.get_many(keys) == ["primed", 4, 6, 8, 10]
+        assert fetcher._cache == {4: 8, 5: 10}
+        assert fetcher.get(3) == 6
+
+        async_fetcher = AsyncFetcher.get_instance()
+        values = async_to_sync(async_fetcher.aget_many)(keys)
+        assert values == [2, 4, 6, 8, 10]
+        assert len(async_fetcher._cache) == 2
+
+
+def test_budget_in_bytes(settings):
+    settings.DATA_FETCHER_MAX_BYTES = 10_000
+
+    class StringFetcher(DataFetcher):
+        def batch_load_dict(self, keys):
+            return {key: "x" * 1000 for key in keys}
+
+    with GlobalRequest():
+        fetcher = StringFetcher.get_instance()
+        fetcher.prefetch_keys(range(100))
+
+        budget = get_request_budget()
+        assert budget.num_bytes <= 10_000
+        assert len(fetcher._cache) == len(budget) < 10
+        assert get_stats_for(StringFetcher).evictions == 100 - len(budget)
+        assert "evicted" in get_server_timing_header()
+
+
+def test_evict_and_clear_release_budget(settings):
+    settings.DATA_FETCHER_MAX_ENTRIES = 10
+
+    with GlobalRequest():
+        fetcher = DoublingFetcher.get_instance()
+        fetcher.prefetch_keys([1, 2, 3])
+        fetcher.evict([1])
+        assert len(get_request_budget()) == 2
+
+        DoublingFetcher.clear()
+        assert len(get_request_budget()) == 0
+
+        fetcher.prefetch_keys([1, 2, 3])
+        old_budget = get_request_budget()
+        clear_request_caches()
+        assert get_request_budget() is not old_budget
+        assert len(get_request_budget()) == 0
+        assert get_stats_for(DoublingFetcher).evictions == 0
+
+
+@pytest.mark.parametrize(
+    "value, min_size",
+    [
+        ("x" * 1000, 1000),
+        (["x" * 1000, "y" * 1000], 2000),
+        ({"a": "x" * 1000}, 1000),
+    ],
+)
+def test_approximate_size(value, min_size):
+    assert min_size < get_approximate_size(value) < min_size + 1000
@@ -8,6 +8,8 @@ import pytest
 from data_fetcher import cache_within_request, get_datafetcher_request_cache
 from data_fetcher.extras import CacheDecoratorException
 from data_fetcher.util import GlobalRequest, get_request
+from sample_app import data_factories
+from sample_app.models import Author
 
 
 def test_cache_decorator():
@@ -163,3 +165,236 @@ def test_classmethod_wrong_order():
             @classmethod
             def _other_value(cls):
                 pass
+
+
+def test_cache_normalizes_kwarg_order():
+    spy = MagicMock()
+
+    @cache_within_request
+    def add(a, b=0, c=0):
+        spy()
+        return a + b + c
+
+    with GlobalRequest():
+        assert add(1, b=2, c=3) == 6
+        assert add(1, c=3, b=2) == 6
+        assert spy.call_count == 1
+
+    @cache_within_request
+    def identity(*args, **kwargs):
+        return args, kwargs
+
+    with GlobalRequest():
+        # kwargs never collide with positional tuples
+        assert identity(1, b=2) == ((1,), {"b": 2})
+        assert identity(1, ("b", 2)) == ((1, ("b", 2)), {})
+
+
+def test_cache_clear_for_request():
+    spy = MagicMock()
+
+    @cache_within_request
+    def double(x):
+        spy(x)
+        return x * 2
+
+    with GlobalRequest():
+        double(1)
+        double(2)
+        double.cache_clear_for_request(1)
+        double(1)
+        double(2)
+        assert spy.call_args_list == [((1,),), ((2,),), ((1,),)]
+
+        double.cache_clear()
+        double(2)
+        assert spy.call_count == 4
+
+    # no-ops outside of a request
+    double.cache_clear_for_request(1)
+    double.cache_clear()
+
+
+def test_cache_normalizes_arguments_against_signature():
+    spy = MagicMock()
+
+    @cache_within_request()
+    def add(a, b=2):
+        spy()
+        return a + b
+
+    with GlobalRequest():
+        assert add(1, b=2) == 3
+        assert add(1, 2) == 3
+        assert add(1) == 3
+        assert add(a=1) == 3
+        assert spy.call_count == 1
+
+        with pytest.raises(TypeError):
+            add(1, c=3)
+
+
+def test_cache_normalizes_keyword_only_defaults():
+    spy = MagicMock()
+
+    @cache_within_request
+    def add(a, *, b=2):
+        spy()
+        return a + b
+
+    with GlobalRequest():
+        assert add(1) == 3
+        assert add(1, b=2) == 3
+        assert spy.call_count == 1
+        assert add(1, b=3) == 4
+        assert spy.call_count == 2
+
+
+def test_cache_maxsize_evicts_least_recently_used():
+    spy = MagicMock()
+
+    @cache_within_request(maxsize=2)
+    def double(x):
+        spy(x)
+        return x * 2
+
+    with GlobalRequest():
+        double(1)
+        double(2)
+        double(1)
+        # evicts 2, the least recently used value
+        double(3)
+        assert double.cache_info().currsize == 2
+
+        double(1)
+        double(2)
+        assert spy.call_args_list == [((1,),), ((2,),), ((3,),), ((2,),)]
+
+    @cache_within_request(maxsize=0)
+    def uncached_double(x):
+        spy(x)
+        return x * 2
+
+    spy.reset_mock()
+    with GlobalRequest():
+        uncached_double(1)
+        uncached_double(1)
+        assert spy.call_count == 2
+
+
+def test_cache_typed():
+    @cache_within_request(typed=True)
+    def identity(x):
+        return x
+
+    with GlobalRequest():
+        assert type(identity(1)) is int
+        assert type(identity(1.0)) is float
+        assert identity.cache_info().misses == 2
+
+
+def test_cache_info_is_per_request():
+    @cache_within_request(maxsize=10)
+    def double(x):
+        return x * 2
+
+    assert double.cache_info() == (0, 0, 10, 0)
+
+    with GlobalRequest():
+        double(1)
+        double(1)
+        double(2)
+        assert double.cache_info() == (1, 2, 10, 2)
+
+    with GlobalRequest():
+        double(1)
+        assert double.cache_info() == (0, 1, 10, 1)
+
+
+def test_cache_with_unhashable_arguments():
+    spy = MagicMock()
+
+    @cache_within_request
+    def count_items(items, options=None):
+        spy()
+        return len(items)
+
+    with GlobalRequest():
+        assert count_items([1, 2], options={"a": [1]}) == 2
+        assert count_items([1, 2], options={"a": [1]}) == 2
+        assert count_items({1, 2}) == 2
+        assert count_items({2, 1}) == 2
+        assert count_items([2, 1]) == 2
+        assert spy.call_count == 3
+
+
+def test_cache_keys_model_instances_by_pk():
+    spy = MagicMock()
+    author, other_author = data_factories.AuthorFactory.create_batch(2)
+
+    @cache_within_request
+    def get_name(author):
+        spy()
+        return author.first_name
+
+    with GlobalRequest():
+        get_name(author)
+        get_name(Author.objects.get(pk=author.pk))
+        assert spy.call_count == 1
+        get_name(other_author)
+        assert spy.call_count == 2
+
+
+def test_cache_keys_unsaved_model_instances_by_identity():
+    @cache_within_request
+    def get_name(author):
+        return author.first_name
+
+    with GlobalRequest():
+        author = Author(first_name="a")
+        assert get_name(author) == "a"
+        assert get_name(author) == "a"
+        assert get_name(Author(first_name="b")) == "b"
+
+        author.save()
+        # saved instances are keyed by pk from then on
+        assert get_name(Author.objects.get(pk=author.pk)) == "a"
+
+
+def test_cache_keys_querysets_by_sql():
+    spy = MagicMock()
+    authors = data_factories.AuthorFactory.create_batch(2)
+
+    @cache_within_request
+    def count(queryset):
+        spy()
+        return queryset.count()
+
+    with GlobalRequest():
+        assert count(Author.objects.filter(pk=authors[0].pk)) == 1
+        assert count(Author.objects.filter(pk=authors[0].pk)) == 1
+        assert count(Author.objects.all()) == 2
+        assert count(Author.objects.none()) == 0
+        assert spy.call_count == 3
+
+
+def test_cache_with_custom_key_function():
+    spy = MagicMock()
+
+    @cache_within_request(key=str.lower)
+    def greet(name):
+        spy()
+        return f"hello {name}"
+
+    with GlobalRequest():
+        assert greet("Bob") == "hello Bob"
+        assert greet("BOB") == "hello Bob"
+        assert spy.call_count == 1
+
+    @cache_within_request(key=None)
+    def count_items(items):
+        return len(items)
+
+    with GlobalRequest():
+        with pytest.raises(TypeError):
+            count_items([1, 2])
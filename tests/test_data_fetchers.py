@@ -1,14 +1,23 @@
 import datetime
+import threading
+import time
 from unittest.mock import MagicMock
 
 from django.contrib.auth import get_user_model
 
+import pytest
+
 from data_fetcher import (
+    AbstractChildModelByAttrFetcher,
+    AbstractModelByIdFetcher,
     DataFetcher,
     PrimaryKeyFetcherFactory,
     get_datafetcher_request_cache,
+    prefetch_all,
 )
-from data_fetcher.util import GlobalRequest, get_request
+from data_fetcher.util import GlobalRequest, get_request, run_concurrently
+from sample_app import data_factories
+from sample_app.models import Author, Book
 
 
 def test_global_request_outside_request():
@@ -232,3 +241,290 @@ def test_fetch_lazy():
             (([1, 2, 3],),),
             (([4, 5],),),
         ]
+
+
+def test_queue_drains_once_loaded():
+    spy = MagicMock()
+
+    class TestFetcher(DataFetcher):
+        def batch_load_dict(self, keys):
+            spy(keys)
+            return {key: key * 2 for key in keys}
+
+    with GlobalRequest():
+        fetcher = TestFetcher.get_instance()
+        fetcher.enqueue_keys(range(1000))
+        assert fetcher.get(0) == 0
+        assert spy.call_count == 1
+        assert len(fetcher._queue) == 0
+
+        # cached keys are never enqueued
+        fetcher.enqueue_keys([1, 2, 3])
+        assert len(fetcher._queue) == 0
+
+        # cache hits don't go through get_many
+        fetcher.get_many = MagicMock()
+        assert fetcher.get(999) == 1998
+        fetcher.get_many.assert_not_called()
+
+
+def test_get_many_dedupes_uncached_keys():
+    spy = MagicMock()
+
+    class TestFetcher(DataFetcher):
+        def batch_load(self, keys):
+            spy(keys)
+            return [key * 2 for key in keys]
+
+    with GlobalRequest():
+        fetcher = TestFetcher.get_instance()
+        assert fetcher.get_many([3, 1, 3, 2]) == [6, 2, 6, 4]
+        spy.assert_called_once_with([3, 1, 2])
+
+
+def test_max_batch_size_splits_batches():
+    spy = MagicMock()
+
+    class TestFetcher(DataFetcher):
+        max_batch_size = 3
+
+        def batch_load(self, keys):
+            spy(keys)
+            return [key * 2 for key in keys]
+
+    with GlobalRequest():
+        fetcher = TestFetcher.get_instance()
+        assert fetcher.get_many(list(range(8))) == [
+            key * 2 for key in range(8)
+        ]
+        assert spy.call_args_list == [
+            (([0, 1, 2],),),
+            (([3, 4, 5],),),
+            (([6, 7],),),
+        ]
+
+
+# outside of a transaction, which would keep loads in this thread
+@pytest.mark.django_db(transaction=True)
+def test_max_batch_workers_loads_chunks_concurrently():
+    thread_names = set()
+
+    class TestFetcher(DataFetcher):
+        max_batch_size = 10
+        max_batch_workers = 4
+
+        def batch_load_dict(self, keys):
+            # the global request is available inside worker threads
+            assert get_request() is request
+            thread_names.add(threading.current_thread().name)
+            return {key: key * 2 for key in keys}
+
+    with GlobalRequest() as request:
+        fetcher = TestFetcher.get_instance()
+        keys = list(reversed(range(100)))
+        assert fetcher.get_many(keys) == [key * 2 for key in keys]
+        assert fetcher._cache == {key: key * 2 for key in keys}
+
+    assert threading.current_thread().name not in thread_names
+
+
+class ChunkedAuthorByIdFetcher(AbstractModelByIdFetcher):
+    model = Author
+    max_batch_size = 2
+    max_batch_workers = 3
+
+
+def test_max_batch_workers_within_a_transaction(django_assert_num_queries):
+    # the test's transaction holds a write lock, and hides the new rows
+    # from other threads' connections
+    authors = data_factories.AuthorFactory.create_batch(5)
+    author_ids = [a.id for a in authors]
+
+    with GlobalRequest():
+        with django_assert_num_queries(3):
+            fetched = ChunkedAuthorByIdFetcher.get_instance().get_many(
+                author_ids
+            )
+        assert fetched == authors
+
+
+@pytest.mark.django_db(transaction=True)
+def test_max_batch_workers_with_model_fetcher():
+    authors = data_factories.AuthorFactory.create_batch(5)
+
+    with GlobalRequest():
+        fetcher = ChunkedAuthorByIdFetcher.get_instance()
+        assert fetcher.get_many([a.id for a in authors]) == authors
+
+
+def test_evict_and_clear():
+    spy = MagicMock()
+
+    class TestFetcher(DataFetcher):
+        def batch_load_dict(self, keys):
+            spy(keys)
+            return {key: key * 2 for key in keys}
+
+    class OtherFetcher(TestFetcher):
+        pass
+
+    with GlobalRequest():
+        fetcher = TestFetcher.get_instance()
+        fetcher.prefetch_keys([1, 2, 3])
+        OtherFetcher.get_instance().prefetch_keys([1])
+
+        fetcher.evict([1, 2])
+        assert fetcher.get_many([1, 2, 3]) == [2, 4, 6]
+        spy.assert_called_with([1, 2])
+
+        TestFetcher.clear()
+        assert fetcher._cache == {}
+        # other fetchers are untouched
+        assert OtherFetcher.get_instance()._cache == {1: 2}
+
+    # no-op outside of a request
+    TestFetcher.clear()
+
+
+def test_lazy_value_flushes_queue_on_first_touch():
+    spy = MagicMock()
+
+    class TestFetcher(DataFetcher):
+        def batch_load_dict(self, keys):
+            spy(keys)
+            return {key: [key] * key for key in keys}
+
+    with GlobalRequest():
+        fetcher = TestFetcher.get_instance()
+        fetcher.prime(1, [1])
+
+        l1 = fetcher.get_lazy(1)
+        l2 = fetcher.get_lazy(2)
+        l3 = fetcher.get_lazy(3)
+        assert spy.call_count == 0
+
+        # touching an already-cached value still flushes pending keys
+        assert l1[0] == 1
+        spy.assert_called_once_with([2, 3])
+
+        assert list(l3) == [3, 3, 3]
+        assert len(l2) == 2
+        assert bool(l2)
+        assert spy.call_count == 1
+
+
+def test_lazy_value_forwards_get_arguments():
+    class DictFetcher(DataFetcher):
+        def batch_load_dict(self, keys):
+            return {key: {"double": key * 2} for key in keys}
+
+    with GlobalRequest():
+        lazy_dict = DictFetcher.get_instance().get_lazy(1)
+        assert lazy_dict.get() == {"double": 2}
+        assert lazy_dict.get("double") == 2
+        assert lazy_dict.get("triple", 3) == 3
+
+
+# outside of a transaction, which would keep loads in this thread
+@pytest.mark.django_db(transaction=True)
+def test_prefetch_all_loads_fetchers_concurrently():
+    # only passes if both batch loads are waiting at the same time
+    barrier = threading.Barrier(2, timeout=5)
+    spy = MagicMock()
+
+    class DoublingFetcher(DataFetcher):
+        def batch_load_dict(self, keys):
+            spy(type(self).__name__, keys)
+            barrier.wait()
+            return {key: key * 2 for key in keys}
+
+    class TriplingFetcher(DataFetcher):
+        def batch_load_dict(self, keys):
+            spy(type(self).__name__, keys)
+            barrier.wait()
+            return {key: key * 3 for key in keys}
+
+    with GlobalRequest():
+        TriplingFetcher.get_instance().prime(1, "cached")
+        prefetch_all({DoublingFetcher: [1, 2], TriplingFetcher: [1, 3]})
+
+        assert DoublingFetcher.get_instance()._cache == {1: 2, 2: 4}
+        assert TriplingFetcher.get_instance()._cache == {1: "cached", 3: 9}
+
+    assert sorted(spy.call_args_list) == [
+        (("DoublingFetcher", [1, 2]),),
+        (("TriplingFetcher", [3]),),
+    ]
+
+
+def test_prefetch_all_skips_cached_fetchers():
+    thread_names = set()
+
+    class TestFetcher(DataFetcher):
+        def batch_load_dict(self, keys):
+            thread_names.add(threading.current_thread().name)
+            return {key: key for key in keys}
+
+    class CachedFetcher(TestFetcher):
+        pass
+
+    with GlobalRequest():
+        CachedFetcher.get_instance().prime(1, 1)
+        fetcher = TestFetcher.get_instance()
+        # instances work as well as classes
+        prefetch_all({fetcher: [1, 2], CachedFetcher: [1]})
+        assert fetcher._cache == {1: 1, 2: 2}
+
+    # a single load isn't worth a thread
+    assert thread_names == {threading.current_thread().name}
+
+
+class BooksByAuthorIdFetcher(AbstractChildModelByAttrFetcher):
+    model = Book
+    attr = "author_id"
+
+
+def test_prefetch_all_within_a_transaction(django_assert_num_queries):
+    # worker threads' connections wouldn't see the test transaction's rows
+    authors = data_factories.AuthorFactory.create_batch(2)
+    books = data_factories.BookFactory.create_batch(2, author=authors[0])
+    AuthorFetcher = PrimaryKeyFetcherFactory.get_model_by_id_fetcher(Author)
+    BookFetcher = PrimaryKeyFetcherFactory.get_model_by_id_fetcher(Book)
+
+    with GlobalRequest():
+        with django_assert_num_queries(2):
+            prefetch_all(
+                {
+                    AuthorFetcher: [a.id for a in authors],
+                    BooksByAuthorIdFetcher: [a.id for a in authors],
+                }
+            )
+            assert (
+                AuthorFetcher.get_instance().get_many([a.id for a in authors])
+                == authors
+            )
+            assert BooksByAuthorIdFetcher.get_instance().get_many(
+                [a.id for a in authors]
+            ) == [books, []]
+            # primed by the books-by-author fetcher
+            assert BookFetcher.get_instance().get(books[0].id) == books[0]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_instances_are_created_once_across_threads():
+    class SlowInitFetcher(DataFetcher):
+        def __init__(self, *args, **kwargs):
+            # widens the window between looking up and storing the instance
+            time.sleep(0.05)
+            super().__init__(*args, **kwargs)
+
+        def batch_load_dict(self, keys):
+            return {key: key for key in keys}
+
+    with GlobalRequest():
+        get_datafetcher_request_cache()
+        fetchers = run_concurrently(
+            [SlowInitFetcher.get_instance] * 4, max_workers=4
+        )
+        assert all(fetcher is fetchers[0] for fetcher in fetchers)
+        assert SlowInitFetcher.get_instance() is fetchers[0]
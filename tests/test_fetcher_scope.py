@@ -0,0 +1,85 @@
+from unittest.mock import MagicMock
+
+from django.http import HttpRequest
+
+import pytest
+
+from data_fetcher import DataFetcher, cache_within_request, fetcher_scope
+from data_fetcher.extras import CacheDecoratorWarning
+from data_fetcher.util import get_request
+
+
+class DoublingFetcher(DataFetcher):
+    def batch_load_dict(self, keys):
+        return {key: key * 2 for key in keys}
+
+
+def test_fetcher_scope():
+    assert get_request() is None
+
+    with fetcher_scope() as scope:
+        assert get_request() is scope
+        assert not isinstance(scope, HttpRequest)
+
+        fetcher = DoublingFetcher.get_instance()
+        fetcher.prefetch_keys([1, 2])
+        assert DoublingFetcher.get_instance() is fetcher
+
+        with fetcher_scope():
+            assert DoublingFetcher.get_instance() is not fetcher
+
+        assert get_request() is scope
+
+    assert get_request() is None
+
+
+def test_fetcher_scope_decorator():
+    spy = MagicMock()
+
+    @cache_within_request
+    def double(x):
+        spy(x)
+        return x * 2
+
+    @fetcher_scope()
+    def task(x):
+        return [double(x), double(x)]
+
+    assert task(1) == [2, 2]
+    # each call gets a new scope
+    assert task(1) == [2, 2]
+    assert spy.call_count == 2
+    assert get_request() is None
+
+
+def test_fetcher_scope_resets_every_n_steps():
+    spy = MagicMock()
+
+    @cache_within_request
+    def double(x):
+        spy(x)
+        return x * 2
+
+    with fetcher_scope(reset_every=2) as scope:
+        for _ in scope.iterate(range(4)):
+            double(1)
+            double(1)
+            fetcher = DoublingFetcher.get_instance()
+            fetcher.get(1)
+
+        assert spy.call_count == 2
+        assert scope.steps == 4
+
+        double(1)
+        scope.step()
+        double(1)
+        assert spy.call_count == 3
+
+
+def test_cache_decorator_warns_outside_of_a_scope():
+    @cache_within_request
+    def double(x):
+        return x * 2
+
+    with pytest.warns(CacheDecoratorWarning):
+        assert double(1) == 2
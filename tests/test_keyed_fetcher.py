@@ -1,6 +1,12 @@
 import datetime
+import gc
+from unittest.mock import patch
 
-from data_fetcher import GlobalRequest, ValueBoundDataFetcher
+import pytest
+
+from data_fetcher import GlobalRequest, ValueBoundDataFetcher, fetcher_scope
+from data_fetcher.extras import ValueBoundFetcherFactory
+from data_fetcher.util import MissingRequestContextException
 
 
 def test_keyed_datafetcher_factory():
@@ -25,3 +31,102 @@ def test_keyed_datafetcher_factory():
         loader_for_cls3 = cls3.get_instance()
         assert loader_for_cls1 is not loader_for_cls2
         assert loader_for_cls1 is loader_for_cls3
+
+
+class UserBoundFetcher(ValueBoundDataFetcher):
+    def batch_load_dict(self, keys):
+        return {key: (self.bound_value, key) for key in keys}
+
+
+def test_value_bound_class_uses_value():
+    user = {"id": 1, "name": "unhashable"}
+    bound_cls = UserBoundFetcher.get_value_bound_class(1, user)
+    assert bound_cls.bound_value is user
+
+    with GlobalRequest():
+        assert bound_cls.get_instance().get(5) == (user, 5)
+
+
+def test_bound_instances():
+    classes_before = len(ValueBoundFetcherFactory.datafetcher_classes_by_key)
+
+    with GlobalRequest():
+        fetcher1 = UserBoundFetcher.get_bound_instance(1)
+        fetcher2 = UserBoundFetcher.get_bound_instance(2)
+        assert fetcher1 is not fetcher2
+        assert UserBoundFetcher.get_bound_instance(1) is fetcher1
+        assert type(fetcher1) is UserBoundFetcher
+
+        assert fetcher1.get(5) == (1, 5)
+        assert fetcher2.get(5) == (2, 5)
+        # falsy values can be bound, too
+        assert UserBoundFetcher.get_bound_instance(0).get(5) == (0, 5)
+
+        user = {"id": 3}
+        assert UserBoundFetcher.get_bound_instance(3, user).get(5) == (
+            user,
+            5,
+        )
+
+        UserBoundFetcher.clear()
+        assert fetcher1._cache == {}
+
+    with GlobalRequest():
+        assert UserBoundFetcher.get_bound_instance(1) is not fetcher1
+
+    assert (
+        len(ValueBoundFetcherFactory.datafetcher_classes_by_key)
+        == classes_before
+    )
+
+    with pytest.raises(MissingRequestContextException):
+        UserBoundFetcher.get_instance()
+
+
+def test_value_bound_class_registry_is_bounded():
+    with patch.object(ValueBoundFetcherFactory, "max_classes", 10):
+        first_cls = UserBoundFetcher.get_value_bound_class(0)
+        for user_id in range(1, 100):
+            # keep the first class in use
+            assert UserBoundFetcher.get_value_bound_class(0) is first_cls
+            UserBoundFetcher.get_value_bound_class(user_id)
+
+        registry = ValueBoundFetcherFactory.datafetcher_classes_by_key
+        assert len(registry) == 10
+        assert registry[(UserBoundFetcher, 0)] is first_cls
+        assert (UserBoundFetcher, 1) not in registry
+
+
+def test_memory_stays_flat_across_bound_values():
+    classes_before = len(ValueBoundFetcherFactory.datafetcher_classes_by_key)
+
+    with fetcher_scope(reset_every=1000) as scope:
+        for user_id in scope.iterate(range(1_000_000)):
+            UserBoundFetcher.get_bound_instance(user_id).prime(1, user_id)
+
+        gc.collect()
+        live_fetchers = sum(
+            isinstance(obj, UserBoundFetcher) for obj in gc.get_objects()
+        )
+
+    # only the current 1000-value window is alive, and no classes were made
+    assert live_fetchers <= 1000
+    assert (
+        len(ValueBoundFetcherFactory.datafetcher_classes_by_key)
+        == classes_before
+    )
+
+    # classes made per value are bounded by the registry, and scope resets
+    with fetcher_scope(reset_every=100) as scope:
+        for user_id in scope.iterate(range(20_000)):
+            bound_cls = UserBoundFetcher.get_value_bound_class(user_id)
+            bound_cls.get_instance().prime(1, user_id)
+
+        gc.collect()
+        live_classes = sum(
+            isinstance(obj, type) and issubclass(obj, UserBoundFetcher)
+            for obj in gc.get_objects()
+        )
+
+    max_classes = ValueBoundFetcherFactory.max_classes
+    assert live_classes <= max_classes + 100
@@ -60,3 +60,21 @@ def test_async_view_with_loader():
 
     assert spy1.call_count == 1
     assert spy2.call_count == 1
+
+
+def test_native_async_view_with_loader():
+    u = data_factories.UserFactory()
+    client = Client()
+    client.force_login(u)
+
+    data_factories.AuthorFactory.create_batch(20)
+
+    url = reverse("native_async_view1")
+
+    spy = MagicMock()
+    with patch("sample_app.views.spyable_func", spy):
+        response = client.get(url)
+        assert response.status_code == 200
+
+    assert spy.call_count == 1
+    assert len(spy.call_args[0][0]) == 20
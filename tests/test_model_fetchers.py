@@ -0,0 +1,786 @@
+import pickle
+from unittest.mock import patch
+
+import django
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Count, Max
+from django.template import Context, Template
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+import pytest
+
+from data_fetcher import (
+    AbstractAggregateByAttrFetcher,
+    AbstractChildModelByAttrFetcher,
+    AbstractManyToManyFetcher,
+    AbstractModelByCompositeKeyFetcher,
+    AbstractModelByIdFetcher,
+    AbstractTopNChildModelByAttrFetcher,
+    ManyToManyFetcherFactory,
+    PrimaryKeyFetcherFactory,
+    ValueBoundDataFetcher,
+)
+from data_fetcher.stats import get_request_stats
+from data_fetcher.util import GlobalRequest
+from sample_app import data_factories
+from sample_app.models import Author, Book, Shelf, ShelfEntry, Tag
+
+AuthorByIdFetcher = PrimaryKeyFetcherFactory.get_model_by_id_fetcher(Author)
+BookByIdFetcher = PrimaryKeyFetcherFactory.get_model_by_id_fetcher(Book)
+
+
+class BookByAuthorIdFetcher(AbstractChildModelByAttrFetcher):
+    model = Book
+    attr = "author_id"
+
+
+def test_saving_a_record_evicts_only_its_key(django_assert_num_queries):
+    books = data_factories.BookFactory.create_batch(3)
+    book_ids = [b.id for b in books]
+
+    with GlobalRequest():
+        fetcher = BookByIdFetcher.get_instance()
+        fetcher.prefetch_keys(book_ids)
+
+        books[0].title = "new title"
+        books[0].save()
+
+        assert set(fetcher._cache) == set(book_ids[1:])
+        with django_assert_num_queries(1):
+            assert fetcher.get(book_ids[0]).title == "new title"
+            fetcher.get_many(book_ids)
+
+        books[1].delete()
+        assert fetcher.get(book_ids[1]) is None
+
+
+def test_child_fetcher_invalidation(django_assert_num_queries):
+    author1, author2 = data_factories.AuthorFactory.create_batch(2)
+    book = data_factories.BookFactory(author=author1)
+
+    with GlobalRequest():
+        fetcher = BookByAuthorIdFetcher.get_instance()
+        assert fetcher.get_many([author1.id, author2.id]) == [[book], []]
+
+        # moving a book evicts both the old and new parent
+        book.author = author2
+        book.save()
+        assert fetcher._cache == {}
+
+        with django_assert_num_queries(1):
+            assert fetcher.get_many([author1.id, author2.id]) == [[], [book]]
+
+        # creating a sibling only evicts its parent
+        data_factories.BookFactory(author=author1)
+        assert set(fetcher._cache) == {author2.id}
+
+
+def test_m2m_changes_evict_records():
+    book = data_factories.BookFactory()
+    other_book = data_factories.BookFactory()
+    tag = data_factories.TagFactory()
+
+    with GlobalRequest():
+        fetcher = BookByIdFetcher.get_instance()
+        fetcher.prefetch_keys([book.id, other_book.id])
+
+        book.tags.add(tag)
+        assert set(fetcher._cache) == {other_book.id}
+
+        fetcher.prefetch_keys([book.id])
+        tag.book_set.add(other_book)
+        assert set(fetcher._cache) == {book.id}
+
+
+def test_invalidation_covers_shared_tier(django_assert_num_queries):
+    authors = data_factories.AuthorFactory.create_batch(2)
+
+    class SharedAuthorByIdFetcher(
+        PrimaryKeyFetcherFactory.get_model_by_id_fetcher(Author)
+    ):
+        shared_cache_alias = "default"
+        shared_cache_prefix = "shared-author"
+
+    caches["default"].clear()
+    with GlobalRequest():
+        SharedAuthorByIdFetcher.get_instance().prefetch_keys(
+            [a.id for a in authors]
+        )
+
+    # saving outside a request still evicts the shared tier
+    authors[0].first_name = "changed"
+    authors[0].save()
+
+    with GlobalRequest():
+        with django_assert_num_queries(1):
+            fetched = SharedAuthorByIdFetcher.get_instance().get_many(
+                [a.id for a in authors]
+            )
+        assert fetched[0].first_name == "changed"
+
+    caches["default"].clear()
+
+
+def test_shared_tier_evicts_old_and_new_parents():
+    author1, author2 = data_factories.AuthorFactory.create_batch(2)
+    book = data_factories.BookFactory(author=author1)
+
+    class SharedBooksByAuthorIdFetcher(BookByAuthorIdFetcher):
+        shared_cache_alias = "default"
+        shared_cache_prefix = "shared-books-by-author"
+
+    class SharedBookCountByAuthorIdFetcher(AbstractAggregateByAttrFetcher):
+        model = Book
+        attr = "author_id"
+        aggregate = Count("id")
+        shared_cache_alias = "default"
+        shared_cache_prefix = "shared-book-count-by-author"
+
+    author_ids = [author1.id, author2.id]
+    caches["default"].clear()
+    with GlobalRequest():
+        books_fetcher = SharedBooksByAuthorIdFetcher.get_instance()
+        assert books_fetcher.get_many(author_ids) == [[book], []]
+        count_fetcher = SharedBookCountByAuthorIdFetcher.get_instance()
+        assert count_fetcher.get_many(author_ids) == [1, 0]
+
+    # moving the book outside a request, its old parent's keys are evicted
+    # from the shared tier too
+    book.author = author2
+    book.save()
+
+    with GlobalRequest():
+        books_fetcher = SharedBooksByAuthorIdFetcher.get_instance()
+        assert books_fetcher.get_many(author_ids) == [[], [book]]
+        count_fetcher = SharedBookCountByAuthorIdFetcher.get_instance()
+        assert count_fetcher.get_many(author_ids) == [0, 1]
+
+    caches["default"].clear()
+
+
+def test_opt_out_of_invalidation():
+    tag = data_factories.TagFactory()
+
+    class TagByIdFetcher(
+        PrimaryKeyFetcherFactory.get_model_by_id_fetcher(Tag)
+    ):
+        invalidate_on_change = False
+
+    with GlobalRequest():
+        fetcher = TagByIdFetcher.get_instance()
+        fetcher.prefetch_keys([tag.id])
+        tag.save()
+        assert tag.id in fetcher._cache
+
+
+def test_lazy_values_in_templates(django_assert_num_queries):
+    books = data_factories.BookFactory.create_batch(3)
+
+    template = Template(
+        "{% for book in books %}{{ book.title }},{% endfor %}"
+        "{% for book in other_books %}{{ book.title }},{% endfor %}"
+        "{% if missing_book %}missing{% endif %}"
+    )
+
+    with GlobalRequest():
+        fetcher = BookByIdFetcher.get_instance()
+        lazy_books = [fetcher.get_lazy(b.id) for b in books]
+        lazy_list = fetcher.get_many_lazy([b.id for b in reversed(books)])
+        missing_book = fetcher.get_lazy(-1)
+
+        with django_assert_num_queries(1):
+            rendered = template.render(
+                Context(
+                    {
+                        "books": lazy_books,
+                        "other_books": lazy_list,
+                        "missing_book": missing_book,
+                    }
+                )
+            )
+
+        titles = [b.title for b in books]
+        assert rendered == ",".join([*titles, *reversed(titles), ""])
+
+        # proxies behave like the fetched values
+        assert isinstance(lazy_books[0], Book)
+        assert lazy_books[0] == books[0]
+        assert len(lazy_list) == 3
+        assert not missing_book
+        assert missing_book.get() is None
+
+
+def test_get_all_honors_queryset(django_assert_num_queries):
+    author1, author2 = data_factories.AuthorFactory.create_batch(2)
+    books = data_factories.BookFactory.create_batch(3, author=author1)
+    other_book = data_factories.BookFactory(author=author2)
+
+    with GlobalRequest():
+        fetcher = BookByIdFetcher.get_instance()
+        with django_assert_num_queries(1):
+            records = fetcher.get_all(Book.objects.filter(author=author1))
+            assert set(records) == set(books)
+            assert fetcher.get(books[0].id) is records[0]
+
+        assert other_book.id not in fetcher._cache
+
+
+def test_iter_all_streams_in_chunks(django_assert_num_queries):
+    books = data_factories.BookFactory.create_batch(5)
+
+    with GlobalRequest():
+        fetcher = BookByIdFetcher.get_instance()
+        records = fetcher.iter_all(chunk_size=2)
+        first = next(records)
+        # records are primed as they are streamed
+        assert fetcher.get(first.id) is first
+        assert len(fetcher._cache) == 1
+        assert len([first, *records]) == 5
+
+        BookByIdFetcher.clear()
+        fetcher.prime_all(Book.objects.order_by("id"))
+        with django_assert_num_queries(0):
+            assert fetcher.get_many([b.id for b in books]) == books
+
+
+def test_values_projection():
+    book = data_factories.BookFactory(title="a title")
+
+    BookTitleFetcher = PrimaryKeyFetcherFactory.get_model_by_id_fetcher(
+        Book, fields=["title"]
+    )
+    assert BookTitleFetcher is not BookByIdFetcher
+    assert (
+        BookTitleFetcher
+        is PrimaryKeyFetcherFactory.get_model_by_id_fetcher(
+            Book, fields=("title",)
+        )
+    )
+
+    with GlobalRequest():
+        record = BookTitleFetcher.get_instance().get(book.id)
+
+    assert record.pk == book.id
+    assert record.title == "a title"
+    assert not hasattr(record, "author_id")
+    # compact, read-only and picklable (e.g. for the shared tier)
+    assert type(record).__slots__ == ()
+    with pytest.raises(AttributeError):
+        record.title = "new title"
+    assert pickle.loads(pickle.dumps(record)) == record
+
+
+def test_only_projection(django_assert_num_queries):
+    book = data_factories.BookFactory(title="a title")
+
+    class BookWithDeferredFieldsFetcher(AbstractModelByIdFetcher):
+        model = Book
+        fields = ["title"]
+        projection = "only"
+
+    with GlobalRequest():
+        with django_assert_num_queries(1):
+            record = BookWithDeferredFieldsFetcher.get_instance().get(book.id)
+            assert record.title == "a title"
+
+        assert isinstance(record, Book)
+        assert record.get_deferred_fields() == {"author_id"}
+
+
+def test_child_fetcher_projection(django_assert_num_queries):
+    author = data_factories.AuthorFactory()
+    books = data_factories.BookFactory.create_batch(2, author=author)
+
+    class BookTitlesByAuthorIdFetcher(BookByAuthorIdFetcher):
+        fields = ["title"]
+
+    with GlobalRequest():
+        fetcher = BookTitlesByAuthorIdFetcher.get_instance()
+        records = fetcher.get(author.id)
+        # the grouping attr is always loaded
+        assert [(r.pk, r.title, r.author_id) for r in records] == [
+            (b.id, b.title, author.id) for b in books
+        ]
+
+        # invalidation works with records too
+        books[0].save()
+        assert fetcher._cache == {}
+
+
+def test_child_fetcher_primes_pk_fetcher(django_assert_num_queries):
+    author = data_factories.AuthorFactory()
+    books = data_factories.BookFactory.create_batch(2, author=author)
+
+    with GlobalRequest():
+        with django_assert_num_queries(1):
+            children = BookByAuthorIdFetcher.get_instance().get(author.id)
+            book_fetcher = BookByIdFetcher.get_instance()
+            assert book_fetcher.get_many([b.id for b in books]) == children
+            assert book_fetcher.get(books[0].id) is children[0]
+
+
+def test_select_related_primes_parent_fetcher(django_assert_num_queries):
+    books = data_factories.BookFactory.create_batch(2)
+    AuthorByIdFetcher = PrimaryKeyFetcherFactory.get_model_by_id_fetcher(
+        Author
+    )
+
+    class BookWithAuthorByIdFetcher(AbstractModelByIdFetcher):
+        model = Book
+        select_related = ["author"]
+
+    with GlobalRequest():
+        author_fetcher = AuthorByIdFetcher.get_instance()
+        # already-cached instances are not replaced
+        cached_author = author_fetcher.get(books[0].author_id)
+
+        with django_assert_num_queries(1):
+            fetched_books = BookWithAuthorByIdFetcher.get_instance().get_many(
+                [b.id for b in books]
+            )
+            assert author_fetcher.get(books[1].author_id) is (
+                fetched_books[1].author
+            )
+            assert author_fetcher.get(books[0].author_id) is cached_author
+
+
+def test_cross_priming_opt_out(django_assert_num_queries):
+    author = data_factories.AuthorFactory()
+    book = data_factories.BookFactory(author=author)
+
+    class NonPrimingFetcher(BookByAuthorIdFetcher):
+        prime_related_fetchers = False
+
+    with GlobalRequest():
+        NonPrimingFetcher.get_instance().get(author.id)
+        assert book.id not in BookByIdFetcher.get_instance()._cache
+
+
+def test_many_to_many_fetcher(django_assert_num_queries):
+    tag1, tag2, tag3 = data_factories.TagFactory.create_batch(3)
+    book1 = data_factories.BookFactory(tags=[tag1, tag2])
+    book2 = data_factories.BookFactory(tags=[tag2, tag3])
+    untagged_book = data_factories.BookFactory()
+
+    BookTagsFetcher = ManyToManyFetcherFactory.get_many_to_many_fetcher(
+        Book, "tags"
+    )
+    assert (
+        BookTagsFetcher
+        is ManyToManyFetcherFactory.get_many_to_many_fetcher(Book, "tags")
+    )
+
+    with GlobalRequest():
+        fetcher = BookTagsFetcher.get_instance()
+        with django_assert_num_queries(2):
+            tags1, tags2, no_tags = fetcher.get_many(
+                [book1.id, book2.id, untagged_book.id]
+            )
+
+        assert tags1 == [tag1, tag2]
+        assert tags2 == [tag2, tag3]
+        assert no_tags == []
+        # shared tags are a single instance
+        assert tags1[1] is tags2[0]
+
+        # tags are primed into their pk fetcher
+        TagByIdFetcher = PrimaryKeyFetcherFactory.get_model_by_id_fetcher(Tag)
+        with django_assert_num_queries(0):
+            assert TagByIdFetcher.get_instance().get(tag3.id) is tags2[1]
+
+        # changing the relation or a related record evicts affected keys
+        book1.tags.remove(tag1)
+        assert set(fetcher._cache) == {book2.id, untagged_book.id}
+        tag3.save()
+        assert set(fetcher._cache) == {untagged_book.id}
+        assert fetcher.get(book1.id) == [tag2]
+
+
+def test_reverse_many_to_many_fetcher(django_assert_num_queries):
+    tag1, tag2 = data_factories.TagFactory.create_batch(2)
+    book1 = data_factories.BookFactory(tags=[tag1, tag2])
+    book2 = data_factories.BookFactory(tags=[tag2])
+
+    class BookTitlesByTagIdFetcher(AbstractManyToManyFetcher):
+        model = Tag
+        field_name = "book"
+        fields = ["title"]
+
+    with GlobalRequest():
+        fetcher = BookTitlesByTagIdFetcher.get_instance()
+        with django_assert_num_queries(2):
+            books_by_tag = fetcher.get_many_as_dict([tag1.id, tag2.id])
+
+        assert [b.title for b in books_by_tag[tag1.id]] == [book1.title]
+        assert [b.pk for b in books_by_tag[tag2.id]] == [book1.id, book2.id]
+
+        book2.tags.add(tag1)
+        assert tag1.id not in fetcher._cache
+
+
+def test_many_to_many_shared_tier_stores_ids(django_assert_num_queries):
+    tag = data_factories.TagFactory(name="old")
+    book = data_factories.BookFactory(tags=[tag])
+
+    class SharedBookTagsFetcher(AbstractManyToManyFetcher):
+        model = Book
+        field_name = "tags"
+        shared_cache_alias = "default"
+        shared_cache_prefix = "shared-book-tags"
+
+    caches["default"].clear()
+    with GlobalRequest():
+        assert SharedBookTagsFetcher.get_instance().get(book.id) == [tag]
+    assert caches["default"].get(f"shared-book-tags:{book.id}") == [tag.id]
+
+    # related records are re-loaded through their pk fetcher
+    tag.name = "new"
+    tag.save()
+    with GlobalRequest():
+        with django_assert_num_queries(1):
+            tags = SharedBookTagsFetcher.get_instance().get(book.id)
+        assert [t.name for t in tags] == ["new"]
+
+    caches["default"].clear()
+
+
+def test_saving_through_rows_evicts_sources():
+    shelf1, shelf2 = Shelf.objects.bulk_create(
+        [Shelf(name="shelf 1"), Shelf(name="shelf 2")]
+    )
+    book1, book2 = data_factories.BookFactory.create_batch(2)
+    ShelfEntry.objects.create(shelf=shelf1, book=book1)
+
+    class SharedShelfBooksFetcher(AbstractManyToManyFetcher):
+        model = Shelf
+        field_name = "books"
+        shared_cache_alias = "default"
+        shared_cache_prefix = "shared-shelf-books"
+
+    caches["default"].clear()
+    with GlobalRequest():
+        fetcher = SharedShelfBooksFetcher.get_instance()
+        assert fetcher.get(shelf1.id) == [book1]
+
+        # no m2m_changed signal is sent for these
+        entry = ShelfEntry.objects.create(shelf=shelf1, book=book2)
+        assert fetcher._cache == {}
+        assert fetcher.get_many([shelf1.id, shelf2.id]) == [
+            [book1, book2],
+            [],
+        ]
+
+    # moving an entry evicts its old shelf from the shared tier too
+    entry.shelf = shelf2
+    entry.save()
+    with GlobalRequest():
+        fetcher = SharedShelfBooksFetcher.get_instance()
+        assert fetcher.get_many([shelf1.id, shelf2.id]) == [[book1], [book2]]
+
+    caches["default"].clear()
+
+
+class LatestBooksByAuthorIdFetcher(AbstractTopNChildModelByAttrFetcher):
+    model = Book
+    attr = "author_id"
+    ordering = ["-id"]
+    limit = 2
+
+
+@pytest.mark.parametrize("use_window_function", [True, False])
+def test_top_n_child_fetcher(use_window_function, django_assert_num_queries):
+    author1, author2, author3 = data_factories.AuthorFactory.create_batch(3)
+    books1 = data_factories.BookFactory.create_batch(4, author=author1)
+    books2 = data_factories.BookFactory.create_batch(1, author=author2)
+    author_ids = [author1.id, author2.id, author3.id]
+
+    with patch(
+        "data_fetcher.shorthand_fetcher_classes._can_filter_on_window_functions",
+        return_value=use_window_function,
+    ):
+        with GlobalRequest():
+            fetcher = LatestBooksByAuthorIdFetcher.get_instance()
+            with CaptureQueriesContext(connection) as ctx:
+                latest = fetcher.get_many(author_ids)
+
+    assert latest == [
+        [books1[3], books1[2]],
+        books2,
+        [],
+    ]
+    # either way, a single query limits the rows
+    [query] = ctx.captured_queries
+    if use_window_function:
+        assert "ROW_NUMBER()" in query["sql"]
+    else:
+        assert "LIMIT 2" in query["sql"]
+
+
+@pytest.mark.skipif(
+    django.VERSION < (4, 2),
+    reason="filtering on window functions needs django 4.2",
+)
+def test_top_n_child_fetcher_limits_rows_in_sql():
+    author = data_factories.AuthorFactory()
+    data_factories.BookFactory.create_batch(5, author=author)
+
+    with GlobalRequest():
+        with CaptureQueriesContext(connection) as ctx:
+            LatestBooksByAuthorIdFetcher.get_instance().get(author.id)
+
+    [query] = ctx.captured_queries
+    assert "ROW_NUMBER()" in query["sql"]
+
+
+def test_aggregate_fetcher(django_assert_num_queries):
+    author1, author2 = data_factories.AuthorFactory.create_batch(2)
+    books = data_factories.BookFactory.create_batch(3, author=author1)
+
+    class BookCountByAuthorIdFetcher(AbstractAggregateByAttrFetcher):
+        model = Book
+        attr = "author_id"
+        aggregate = Count("id")
+
+    class LatestBookIdByAuthorIdFetcher(AbstractAggregateByAttrFetcher):
+        model = Book
+        attr = "author_id"
+        aggregate = Max("id")
+        default = None
+
+    with GlobalRequest():
+        count_fetcher = BookCountByAuthorIdFetcher.get_instance()
+        latest_fetcher = LatestBookIdByAuthorIdFetcher.get_instance()
+        with django_assert_num_queries(2):
+            assert count_fetcher.get_many([author1.id, author2.id]) == [3, 0]
+            assert latest_fetcher.get_many([author1.id, author2.id]) == [
+                books[2].id,
+                None,
+            ]
+
+        books[0].author = author2
+        books[0].save()
+        assert count_fetcher.get_many([author1.id, author2.id]) == [2, 1]
+
+
+class BookByAuthorAndTitleFetcher(AbstractModelByCompositeKeyFetcher):
+    model = Book
+    key_fields = ("author_id", "title")
+
+
+@pytest.mark.parametrize("use_row_values", [True, False])
+def test_composite_key_fetcher(use_row_values, django_assert_num_queries):
+    author1, author2 = data_factories.AuthorFactory.create_batch(2)
+    book1 = data_factories.BookFactory(author=author1, title="a")
+    book2 = data_factories.BookFactory(author=author1, title="b")
+    book3 = data_factories.BookFactory(author=author2, title="a")
+    data_factories.BookFactory(author=author2, title="b")
+
+    keys = [
+        (author1.id, "a"),
+        (author2.id, "a"),
+        (author1.id, "b"),
+        (author2.id, "missing"),
+    ]
+    with GlobalRequest(), patch(
+        "data_fetcher.shorthand_fetcher_classes._supports_row_value_in",
+        return_value=use_row_values,
+    ):
+        fetcher = BookByAuthorAndTitleFetcher.get_instance()
+        with django_assert_num_queries(1):
+            assert fetcher.get_many(keys) == [book1, book3, book2, None]
+
+        # records are keyed back by tuple, and primed by id
+        with django_assert_num_queries(0):
+            assert fetcher.get((author1.id, "a")) == book1
+            assert BookByIdFetcher.get_instance().get(book2.id) == book2
+
+
+def test_composite_key_fetcher_uses_row_values_in_sql():
+    author = data_factories.AuthorFactory()
+    data_factories.BookFactory(author=author, title="a")
+
+    with GlobalRequest():
+        with CaptureQueriesContext(connection) as ctx:
+            BookByAuthorAndTitleFetcher.get_instance().get_many(
+                [(author.id, "a"), (author.id, "b")]
+            )
+
+    assert "VALUES" in ctx.captured_queries[0]["sql"]
+
+
+def test_composite_key_fetcher_invalidation(django_assert_num_queries):
+    author = data_factories.AuthorFactory()
+    book = data_factories.BookFactory(author=author, title="old title")
+
+    with GlobalRequest():
+        fetcher = BookByAuthorAndTitleFetcher.get_instance()
+        assert fetcher.get((author.id, "old title")) == book
+
+        book.title = "new title"
+        book.save()
+
+        # the record's old key is evicted, even though its title changed
+        assert fetcher._cache == {}
+        with django_assert_num_queries(2):
+            assert fetcher.get((author.id, "old title")) is None
+            assert fetcher.get((author.id, "new title")) == book
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return "replica"
+
+
+@pytest.fixture
+def author_with_stale_replica():
+    author = data_factories.AuthorFactory(first_name="fresh")
+    Author.objects.using("replica").create(
+        id=author.id, first_name="stale", last_name=author.last_name
+    )
+    return author
+
+
+@pytest.mark.django_db(databases=["default", "replica"])
+def test_request_cache_is_partitioned_by_alias(author_with_stale_replica):
+    author_id = author_with_stale_replica.id
+
+    with GlobalRequest():
+        replica_fetcher = AuthorByIdFetcher.get_instance(using="replica")
+        assert replica_fetcher.get(author_id).first_name == "stale"
+        assert AuthorByIdFetcher.get_instance(using="replica") is (
+            replica_fetcher
+        )
+
+        primary_fetcher = AuthorByIdFetcher.get_instance()
+        assert primary_fetcher is not replica_fetcher
+        assert primary_fetcher.get(author_id).first_name == "fresh"
+
+
+@pytest.mark.django_db(databases=["default", "replica"])
+def test_fetcher_using_attribute(author_with_stale_replica):
+    class ReplicaAuthorByIdFetcher(AbstractModelByIdFetcher):
+        model = Author
+        using = "replica"
+
+    author_id = author_with_stale_replica.id
+    with GlobalRequest():
+        fetcher = ReplicaAuthorByIdFetcher.get_instance()
+        assert fetcher.get(author_id).first_name == "stale"
+        assert (
+            ReplicaAuthorByIdFetcher.get_instance(using="replica") is fetcher
+        )
+
+        primary_fetcher = ReplicaAuthorByIdFetcher.get_instance(
+            using="default"
+        )
+        assert primary_fetcher.get(author_id).first_name == "fresh"
+
+
+@pytest.mark.django_db(databases=["default", "replica"])
+def test_fetchers_follow_database_routers(author_with_stale_replica):
+    author_id = author_with_stale_replica.id
+    with override_settings(DATABASE_ROUTERS=[ReplicaRouter()]):
+        with GlobalRequest():
+            assert AuthorByIdFetcher.get_instance().get(
+                author_id
+            ).first_name == ("stale")
+            # reading from the primary, e.g. after a write
+            primary_fetcher = AuthorByIdFetcher.get_instance(using="default")
+            assert primary_fetcher.get(author_id).first_name == "fresh"
+
+
+@pytest.mark.django_db(databases=["default", "replica"])
+def test_changes_evict_every_alias(author_with_stale_replica):
+    author = author_with_stale_replica
+    author_books = data_factories.BookFactory.create_batch(2, author=author)
+
+    with GlobalRequest():
+        primary_fetcher = BookByAuthorIdFetcher.get_instance(using="default")
+        replica_fetcher = BookByAuthorIdFetcher.get_instance(using="replica")
+        assert primary_fetcher.get(author.id) == author_books
+        assert replica_fetcher.get(author.id) == []
+
+        # loaded records are primed into the same alias' fetchers
+        assert BookByIdFetcher.get_instance(using="default")._cache
+        assert not BookByIdFetcher.get_instance(using="replica")._cache
+
+        author_books[0].delete()
+        assert primary_fetcher._cache == {}
+        assert replica_fetcher._cache == {}
+
+
+class BooksByAuthorForUserFetcher(
+    ValueBoundDataFetcher, AbstractChildModelByAttrFetcher
+):
+    model = Book
+    attr = "author_id"
+
+
+def test_changes_only_evict_instances_on_the_request():
+    author = data_factories.AuthorFactory()
+    book = data_factories.BookFactory(author=author)
+
+    with GlobalRequest():
+        # value-bound fetchers can't be created without their value
+        book.save()
+        # and unused fetchers aren't created at all
+        assert get_request_stats() == []
+
+        fetcher = BooksByAuthorForUserFetcher.get_bound_instance(1)
+        assert fetcher.get(author.id) == [book]
+        book.save()
+        assert fetcher._cache == {}
+
+
+@pytest.mark.django_db(databases=["default", "replica"])
+def test_changes_evict_shared_tier_for_every_alias(author_with_stale_replica):
+    author = author_with_stale_replica
+
+    class SharedAuthorByIdFetcher(
+        PrimaryKeyFetcherFactory.get_model_by_id_fetcher(Author)
+    ):
+        shared_cache_alias = "default"
+        shared_cache_prefix = "shared-author"
+
+    caches["default"].clear()
+    with GlobalRequest():
+        for using in ["default", "replica"]:
+            SharedAuthorByIdFetcher.get_instance(using=using).get(author.id)
+
+    # saving outside a request evicts aliases that were never used in it
+    author.first_name = "changed"
+    author.save()
+
+    with GlobalRequest():
+        primary_fetcher = SharedAuthorByIdFetcher.get_instance(using="default")
+        assert primary_fetcher.get(author.id).first_name == "changed"
+        replica_fetcher = SharedAuthorByIdFetcher.get_instance(using="replica")
+        assert replica_fetcher.get(author.id).first_name == "stale"
+
+    caches["default"].clear()
+
+
+def test_batch_loads_can_still_be_called_on_the_class():
+    authors = data_factories.AuthorFactory.create_batch(2)
+    books = data_factories.BookFactory.create_batch(2, author=authors[0])
+
+    assert AuthorByIdFetcher.batch_load_dict([authors[0].id]) == {
+        authors[0].id: authors[0]
+    }
+
+    class ClassmethodBookByAuthorIdFetcher(BookByAuthorIdFetcher):
+        @classmethod
+        def batch_load(cls, attr_values):
+            return [
+                [book.title for book in books]
+                for books in super().batch_load(attr_values)
+            ]
+
+    with GlobalRequest():
+        fetcher = ClassmethodBookByAuthorIdFetcher.get_instance()
+        assert fetcher.get_many([a.id for a in authors]) == [
+            [book.title for book in books],
+            [],
+        ]
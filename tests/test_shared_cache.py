@@ -0,0 +1,129 @@
+from unittest.mock import MagicMock
+
+from django.core.cache import caches
+from django.test import override_settings
+
+import pytest
+from asgiref.sync import async_to_sync
+
+from data_fetcher import (
+    AsyncDataFetcher,
+    DataFetcher,
+    PrimaryKeyFetcherFactory,
+)
+from data_fetcher.util import GlobalRequest
+from sample_app import data_factories
+from sample_app.models import Author
+
+
+@pytest.fixture(params=["locmem", "filebased"])
+def shared_cache(request, tmp_path):
+    backends = {
+        "locmem": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+        "filebased": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": str(tmp_path),
+        },
+    }
+    with override_settings(CACHES={"default": backends[request.param]}):
+        caches["default"].clear()
+        yield caches["default"]
+        caches["default"].clear()
+
+
+def test_shared_cache_across_requests(shared_cache):
+    spy = MagicMock()
+
+    class TestFetcher(DataFetcher):
+        shared_cache_alias = "default"
+        shared_cache_prefix = "test-fetcher"
+
+        def batch_load_dict(self, keys):
+            spy(keys)
+            return {key: key * 2 for key in keys if key != 3}
+
+    with GlobalRequest():
+        assert TestFetcher.get_instance().get_many([1, 2, 3]) == [2, 4, None]
+
+    assert shared_cache.get("test-fetcher:1") == 2
+
+    with GlobalRequest():
+        # only keys missing from both tiers are loaded
+        assert TestFetcher.get_instance().get_many([1, 3, 4]) == [
+            2,
+            None,
+            8,
+        ]
+
+    assert spy.call_args_list == [
+        (([1, 2, 3],),),
+        (([4],),),
+    ]
+
+
+def test_shared_cache_with_model_fetcher(
+    shared_cache, django_assert_num_queries
+):
+    authors = data_factories.AuthorFactory.create_batch(3)
+    author_ids = [a.id for a in authors]
+
+    class SharedAuthorByIdFetcher(
+        PrimaryKeyFetcherFactory.get_model_by_id_fetcher(Author)
+    ):
+        shared_cache_alias = "default"
+        shared_cache_timeout = 60
+
+    with GlobalRequest():
+        with django_assert_num_queries(1):
+            SharedAuthorByIdFetcher.get_instance().prefetch_keys(author_ids)
+
+    with GlobalRequest():
+        with django_assert_num_queries(0):
+            fetched = SharedAuthorByIdFetcher.get_instance().get_many(
+                author_ids
+            )
+        assert [a.first_name for a in fetched] == [
+            a.first_name for a in authors
+        ]
+
+
+def test_shared_cache_with_async_fetcher(shared_cache):
+    spy = MagicMock()
+
+    class TestFetcher(AsyncDataFetcher):
+        shared_cache_alias = "default"
+        shared_cache_prefix = "test-async-fetcher"
+
+        async def batch_load(self, keys):
+            spy(keys)
+            return [key * 2 for key in keys]
+
+    with GlobalRequest():
+        values = async_to_sync(TestFetcher.get_instance().aget_many)([1, 2])
+        assert values == [2, 4]
+
+    with GlobalRequest():
+        values = async_to_sync(TestFetcher.get_instance().aget_many)([2, 3])
+        assert values == [4, 6]
+
+    assert spy.call_args_list == [
+        (([1, 2],),),
+        (([3],),),
+    ]
+
+
+def test_shared_cache_keys_are_partitioned_by_alias(shared_cache):
+    class TestFetcher(DataFetcher):
+        shared_cache_alias = "default"
+        shared_cache_prefix = "test-fetcher"
+
+        def batch_load_dict(self, keys):
+            return {key: self.using for key in keys}
+
+    with GlobalRequest():
+        assert TestFetcher.get_instance().get(1) is None
+        assert TestFetcher.get_instance(using="replica").get(1) == "replica"
+
+    assert shared_cache.get("test-fetcher@replica:1") == "replica"
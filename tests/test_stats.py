@@ -0,0 +1,141 @@
+import json
+import logging
+
+from django.test import override_settings
+from django.test.client import Client
+from django.urls import reverse
+
+import pytest
+
+from data_fetcher import (
+    DataFetcher,
+    NPlusOneError,
+    NPlusOneWarning,
+    cache_within_request,
+)
+from data_fetcher.stats import get_request_stats
+from data_fetcher.util import GlobalRequest, clear_request_caches
+from sample_app import data_factories
+
+
+class DoublingFetcher(DataFetcher):
+    max_batch_size = 2
+
+    def batch_load_dict(self, keys):
+        return {key: key * 2 for key in keys}
+
+
+@cache_within_request
+def cached_double(x):
+    return x * 2
+
+
+def test_fetcher_stats():
+    with GlobalRequest():
+        fetcher = DoublingFetcher.get_instance()
+        fetcher.get_many([1, 2, 3])
+        fetcher.get(1)
+        fetcher.get_many([1, 2, 4])
+
+        stats = fetcher._stats
+        assert stats.hits == 3
+        assert stats.misses == 4
+        # [1, 2], [3] then [4]
+        assert stats.batch_calls == 3
+        assert stats.batch_keys == 4
+        assert stats.largest_batch == 2
+        assert stats.load_time > 0
+
+        # stats survive clearing caches
+        clear_request_caches()
+        DoublingFetcher.get_instance().get(1)
+        assert get_request_stats() == [stats]
+        assert stats.misses == 5
+
+    with GlobalRequest():
+        # and are per request
+        assert DoublingFetcher.get_instance()._stats.misses == 0
+
+
+def test_cached_function_stats():
+    with GlobalRequest():
+        cached_double(1)
+        cached_double(1)
+        cached_double(2)
+
+        [stats] = get_request_stats()
+        assert stats.name == "cached_double"
+        assert stats.hits == 1
+        assert stats.misses == 2
+        assert stats.batch_calls == 2
+
+
+def test_middleware_reports_stats(caplog):
+    data_factories.AuthorFactory.create_batch(3)
+    client = Client()
+
+    with override_settings(
+        DATA_FETCHER_SERVER_TIMING=True, DATA_FETCHER_LOG_STATS=True
+    ):
+        with caplog.at_level(logging.INFO, logger="data_fetcher"):
+            response = client.get(reverse("view1"))
+
+    header = response["Server-Timing"]
+    assert header.startswith("df-WatchedAuthorByIdFetcher;dur=")
+    assert 'desc="3 hits, 3 misses, 1 batches"' in header
+
+    [record] = caplog.records
+    logged = json.loads(record.getMessage())
+    assert logged["path"] == reverse("view1")
+    [stats] = logged["data_fetcher_stats"]
+    assert stats["batch_calls"] == 1
+    assert stats["keys_per_batch"] == 3
+
+
+def test_middleware_reporting_is_opt_in():
+    response = Client().get(reverse("view1"))
+    assert not response.has_header("Server-Timing")
+
+
+def test_n_plus_one_detection_raises():
+    with GlobalRequest():
+        fetcher = DoublingFetcher.get_instance()
+        for i in range(9):
+            fetcher.get(i)
+
+        with pytest.raises(NPlusOneError) as exc_info:
+            fetcher.get(9)
+
+    message = str(exc_info.value)
+    assert "DoublingFetcher loaded 10 batches" in message
+    # the call-site is included
+    assert "test_n_plus_one_detection_raises" in message
+    assert "fetcher.get(9)" in message
+
+
+def test_n_plus_one_detection_ignores_real_batches():
+    with GlobalRequest():
+        fetcher = DoublingFetcher.get_instance()
+        for i in range(20):
+            fetcher.get_many([i * 2, i * 2 + 1])
+
+
+@override_settings(
+    DATA_FETCHER_N_PLUS_ONE="warn", DATA_FETCHER_N_PLUS_ONE_THRESHOLD=3
+)
+def test_n_plus_one_detection_warns_once():
+    with GlobalRequest():
+        fetcher = DoublingFetcher.get_instance()
+        with pytest.warns(NPlusOneWarning) as record:
+            for i in range(10):
+                fetcher.get(i)
+
+    assert len(record) == 1
+
+
+@override_settings(DATA_FETCHER_N_PLUS_ONE=None)
+def test_n_plus_one_detection_can_be_disabled():
+    with GlobalRequest():
+        fetcher = DoublingFetcher.get_instance()
+        for i in range(20):
+            fetcher.get(i)